@@ -25,10 +25,11 @@ PYTHONPATH="$PROJECT_DIR/src" "$VENV_PY" "$ETL_SCRIPT" >> "$TMP_OUTPUT" 2>&1 ||
 cat "$TMP_OUTPUT" >> "$LOG_FILE"
 
 if grep -q -i "Vector store regenerado" "$TMP_OUTPUT" || grep -q -i "Vector store creado" "$TMP_OUTPUT"; then
-    echo "[INFO] Cambios detectados — recargando Gunicorn workers..." | tee -a "$LOG_FILE"
-    pkill -HUP -f gunicorn && echo "[INFO] pkill -HUP executed" | tee -a "$LOG_FILE" || echo "[ERROR] pkill falló" | tee -a "$LOG_FILE"
+    # La nueva versión ya quedó publicada en el archivo CURRENT del vector store.
+    # Cada worker la detecta y la carga por su cuenta; no hace falta reiniciar gunicorn.
+    echo "[INFO] Cambios detectados — nueva versión publicada, los workers la cargarán sin reiniciar." | tee -a "$LOG_FILE"
 else
-    echo "[INFO] No se detectaron cambios. No se recarga gunicorn." | tee -a "$LOG_FILE"
+    echo "[INFO] No se detectaron cambios. No se publica una nueva versión." | tee -a "$LOG_FILE"
 fi
 
 rm -f "$TMP_OUTPUT"
@@ -0,0 +1,13 @@
+from pymongo import MongoClient
+from ct.settings.clients import mongo_uri, mongo_collection_pedidos
+from ct.settings.mongo_indexes import PEDIDOS_INDEXES, ensure_indexes
+
+
+# Crea los índices de Mongo que necesita el servidor. Se ejecuta a mano o desde
+# el despliegue, nunca al iniciar los workers: en la colección de pedidos la
+# construcción de un índice tarda y compite con el tráfico.
+if __name__ == "__main__":
+    db = MongoClient(mongo_uri).get_default_database()
+    estado = ensure_indexes(db[mongo_collection_pedidos], PEDIDOS_INDEXES, create=True)
+    for nombre, resultado in estado.items():
+        print(f"{mongo_collection_pedidos}.{nombre}: {resultado}")
@@ -0,0 +1,98 @@
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from pathlib import Path
+from langchain_core.embeddings import Embeddings
+
+
+class EmbeddingCache:
+    """
+    Caché persistente de embeddings en SQLite.
+
+    La llave es el hash SHA-256 del nombre del modelo junto con el texto del
+    chunk, así que cambiar de modelo invalida el caché automáticamente. Los
+    vectores se guardan como float32 en un BLOB.
+    """
+
+    def __init__(self, path: Path, batch_size: int = 500):
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), self.batch_size):
+                lote = keys[i:i + self.batch_size]
+                placeholders = ", ".join(["?"] * len(lote))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", lote
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: dict[str, list[float]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+            )
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Envoltorio de un modelo de embeddings que solo envía al API los textos que
+    no están en el `EmbeddingCache`. Las consultas (`embed_query`) no se cachean.
+
+    `before_request(textos)` se llama justo antes de cada petición al API con
+    los textos que faltaron en el caché (sirve para cobrar el presupuesto solo
+    por lo que de verdad se envía). Es seguro usarlo desde varios hilos.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, before_request=None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.before_request = before_request
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [EmbeddingCache.make_key(self.model, text) for text in texts]
+        cached = self.cache.get_many(list(dict.fromkeys(keys)))
+
+        # Un mismo texto puede repetirse en el lote: se embebe una sola vez
+        faltantes = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in faltantes:
+                faltantes[key] = text
+
+        if faltantes:
+            if self.before_request:
+                self.before_request(list(faltantes.values()))
+            nuevos = self.embeddings.embed_documents(list(faltantes.values()))
+            nuevos = dict(zip(faltantes.keys(), nuevos))
+            self.cache.put_many(nuevos)
+            cached.update({key: np.asarray(vector, dtype=np.float32) for key, vector in nuevos.items()})
+
+        with self._stats_lock:
+            self.hits += len(texts) - len(faltantes)
+            self.misses += len(faltantes)
+        return [cached[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
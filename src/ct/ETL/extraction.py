@@ -6,26 +6,46 @@ import mysql.connector
 pymysql.install_as_MySQLdb()
 from mysql.connector import errorcode
 from ct.settings.clients import ip, port, user, pwd, database, url, tokenapi, tokenct, cookie, dominio, boundary
+from ct.settings.database import get_connection
 
-from typing import List, Dict
+from typing import List, Dict, Iterator
 import cloudscraper 
 import json
 import time
+import threading
 import requests 
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ct.settings.config import SPECS_CHECKPOINT, SPECS_FAILURES
+from ct.ETL.rate_limit import TokenBucket, HostBackoff
 
-scraper = cloudscraper.create_scraper(
-    browser={
-        'browser': 'chrome',
-        'platform': 'windows',
-        'mobile': False
-    }
-)
+_local = threading.local()
 
-scraper.headers.update({
-    'Token-api': tokenapi,
-    'Token-ct': tokenct,
-    'Cookie': cookie
-})
+def create_scraper():
+    scraper = cloudscraper.create_scraper(
+        browser={
+            'browser': 'chrome',
+            'platform': 'windows',
+            'mobile': False
+        }
+    )
+
+    scraper.headers.update({
+        'Token-api': tokenapi,
+        'Token-ct': tokenct,
+        'Cookie': cookie
+    })
+    return scraper
+
+def get_scraper():
+    """Cada hilo usa su propia sesión de cloudscraper (no son seguras entre hilos)."""
+    if not hasattr(_local, "scraper"):
+        _local.scraper = create_scraper()
+    return _local.scraper
+
+
+class BlockedError(RuntimeError):
+    """El servidor respondió 403 o con una página HTML de bloqueo."""
 
 
 class Extraction():
@@ -35,6 +55,7 @@ class Extraction():
     self.user = user
     self.pwd = pwd
     self.database = database
+    self.spec_errors = {}
 
   def ids_query(self) -> str:
     query = """
@@ -52,15 +73,7 @@ class Extraction():
 
   def get_valid_ids(self) -> list:
     try:
-      cnx = mysql.connector.connect(
-          host=self.ip,
-          port=self.port,
-          user=self.user,
-          password=self.pwd,
-          database=self.database,
-          read_timeout=60,
-          write_timeout=15
-      )
+      cnx = get_connection()
       cursor = cnx.cursor(buffered=False)
       cursor.execute(self.ids_query())
       ids_validos = [row[0] for row in cursor.fetchall()]
@@ -78,7 +91,9 @@ class Extraction():
       if 'cnx' in locals() and cnx is not None:
           cnx.close()
 
-  def product_query(self, id):
+  def product_query(self, total_ids: int) -> str:
+      # Un placeholder por id: el lote completo se resuelve en una sola consulta
+      placeholders = ", ".join(["%s"] * total_ids)
       query = f"""
       SELECT 
           pro.descripcion_corta_icecat AS nombre,  
@@ -95,35 +110,50 @@ class Extraction():
         ON pro.idCategoria = cat.idCategoria
       LEFT JOIN marcas m 
         ON pro.idMarca = m.idMarca
-      WHERE pro.idProductos IN ({id})
+      WHERE pro.idProductos IN ({placeholders})
       GROUP BY pro.idProductos;
       """
       return query
 
+  def _iter_product_rows(self, cursor, ids_validos: list, batch_size: int, fetch_size: int):
+    """
+    Ejecuta `product_query` por lotes de `batch_size` ids y va entregando las filas
+    en bloques de `fetch_size`. El cursor no es buffered, así que el servidor las
+    envía conforme se leen y nunca se materializa un lote completo en el cliente.
+    """
+    for inicio in range(0, len(ids_validos), batch_size):
+      lote = ids_validos[inicio:inicio + batch_size]
+      cursor.execute(self.product_query(len(lote)), tuple(lote))
+      while True:
+        filas = cursor.fetchmany(fetch_size)
+        if not filas:
+          break
+        yield filas
 
-  def get_products(self, ids_validos: list) -> pd.DataFrame:
-    print(ids_validos)
+  def get_products(self, ids_validos: list, batch_size: int = 2000, fetch_size: int = 5000) -> pd.DataFrame:
     try:
-      cnx = mysql.connector.connect(
-          host=self.ip,
-          port=self.port,
-          user=self.user,
-          password=self.pwd,
-          database=self.database,
-          read_timeout=60,
-          write_timeout=15
-      )
+      cnx = get_connection()
       cursor = cnx.cursor(buffered=False)
-      filas = []
-      for id in ids_validos:
-          cursor.execute(self.product_query(id))
-          filas.append(cursor.fetchall())
-      columnas = [desc[0] for desc in cursor.description]
-      datos = []
-      for file in filas:
-          for producto in file:
-              datos.append(producto)
-      print(f"Cantidad de productos: {len(datos)}")
+      inicio = time.perf_counter()
+
+      columnas = None
+      datos = {}
+      total = 0
+      for filas in self._iter_product_rows(cursor, list(ids_validos), batch_size, fetch_size):
+        if columnas is None:
+          columnas = [desc[0] for desc in cursor.description]
+          datos = {col: [] for col in columnas}
+        # Construcción por columnas: se transpone el bloque y se extiende cada lista
+        for col, valores in zip(columnas, zip(*filas)):
+          datos[col].extend(valores)
+        total += len(filas)
+
+      duracion = time.perf_counter() - inicio
+      velocidad = total / duracion if duracion > 0 else 0
+      print(f"Cantidad de productos: {total} ({duracion:.2f} s, {velocidad:,.0f} filas/s)")
+
+      if columnas is None:
+        columnas = [desc[0] for desc in cursor.description] if cursor.description else []
       productos = pd.DataFrame(datos, columns=columnas)
       return productos
     
@@ -141,6 +171,46 @@ class Extraction():
       if 'cnx' in locals() and cnx is not None:
           cnx.close()
 
+  def iter_products(self, ids_validos: list, batch_size: int = 2000, fetch_size: int = 5000) -> Iterator[pd.DataFrame]:
+    """
+    Modo streaming de `get_products`: entrega un DataFrame por cada lote de
+    `batch_size` ids en lugar de acumular todo el catálogo. Si MySQL falla a
+    mitad del stream el error se propaga para que el consumidor no guarde un
+    índice incompleto.
+    """
+    cnx = None
+    cursor = None
+    try:
+      cnx = get_connection()
+      cursor = cnx.cursor(buffered=False)
+      ids_validos = list(ids_validos)
+      for inicio in range(0, len(ids_validos), batch_size):
+        lote = ids_validos[inicio:inicio + batch_size]
+        columnas = None
+        datos = {}
+        for filas in self._iter_product_rows(cursor, lote, batch_size, fetch_size):
+          if columnas is None:
+            columnas = [desc[0] for desc in cursor.description]
+            datos = {col: [] for col in columnas}
+          for col, valores in zip(columnas, zip(*filas)):
+            datos[col].extend(valores)
+        if columnas:
+          yield pd.DataFrame(datos, columns=columnas)
+    except mysql.connector.Error as err:
+      if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
+          print("Hay un error con la contraseña o el usuario")
+      elif err.errno == errorcode.ER_BAD_DB_ERROR:
+          print("La base de datos no existe")
+      else:
+          print(err)
+      # Un stream cortado a la mitad no debe publicarse como catálogo completo
+      raise
+    finally:
+      if cursor:
+          cursor.close()
+      if cnx:
+          cnx.close()
+
   def current_sales_query(self) -> str:
       # Modificado para no usar JSON_ARRAYAGG y traer listaPrecio y precio en filas separadas
       query = f"""
@@ -181,15 +251,7 @@ ORDER BY
 
   def get_current_sales(self) -> pd.DataFrame:
     try:
-      cnx = mysql.connector.connect(
-          host=self.ip,
-          port=self.port,
-          user=self.user,
-          password=self.pwd,
-          database=self.database,
-          read_timeout=60,
-          write_timeout=15
-      )
+      cnx = get_connection()
       cursor = cnx.cursor(buffered=False)
       cursor.execute(self.current_sales_query())
       columnas = [desc[0] for desc in cursor.description]
@@ -214,15 +276,7 @@ ORDER BY
 
   def get_existences(self) -> pd.DataFrame:
     try:
-      cnx = mysql.connector.connect(
-          host=self.ip,
-          port=self.port,
-          user=self.user,
-          password=self.pwd,
-          database=self.database,
-          read_timeout=60,
-          write_timeout=15
-      )
+      cnx = get_connection()
       cursor = cnx.cursor(buffered=False)
       cursor.execute("""
       SELECT pro.clave, SUM(e.cantidad) AS existencias
@@ -249,55 +303,130 @@ ORDER BY
       if 'cnx' in locals() and cnx is not None:
           cnx.close()
 
-  def get_specifications_cloudscraper(self, claves: List[str], max_retries: int = 3, sleep_seconds: float = 0.15) -> Dict[str, dict]:
+  def _fetch_specification(self, clave: str) -> dict:
+    payload = {'claveProducto': clave}
+    response = get_scraper().post(url, data=payload, timeout=5)  # timeout importante
+    content_type = response.headers.get('Content-Type', '').lower()
+
+    if response.status_code == 200:
+        if 'application/json' in content_type:
+            json_response = response.json()
+
+            if isinstance(json_response, dict):
+                respuesta = json_response.get("respuesta", {})
+                if respuesta.get("status") == "success":
+                    return json_response
+                else:
+                    raise ValueError(f"Respuesta no exitosa para clave {clave}")
+            else:
+                raise ValueError("Estructura de JSON inválida")
+        elif '<html' in response.text.lower():
+            raise BlockedError("Respuesta HTML inesperada (posible bloqueo)")
+        else:
+            raise ValueError("Respuesta desconocida sin JSON")
+    elif response.status_code == 403:
+        raise BlockedError("403 Forbidden: IP bloqueada")
+    elif response.status_code == 429:
+        raise BlockedError("429 Too Many Requests")
+    elif response.status_code >= 500:
+        # Error temporal del servidor: se reintenta
+        raise requests.exceptions.HTTPError(f"HTTP error {response.status_code}")
+    else:
+        # Cualquier otro código no mejora reintentando
+        raise RuntimeError(f"HTTP error {response.status_code}")
+
+  def _load_specs_checkpoint(self, claves: set) -> Dict[str, dict]:
+    """Recupera las fichas ya descargadas por una ejecución anterior que no terminó."""
     specs = {}
+    if not SPECS_CHECKPOINT.exists():
+      return specs
+    with open(SPECS_CHECKPOINT, "r", encoding="utf-8") as f:
+      for linea in f:
+        try:
+          registro = json.loads(linea)
+        except json.JSONDecodeError:
+          continue  # Última línea incompleta si el proceso murió escribiendo
+        if registro.get("clave") in claves:
+          specs[registro["clave"]] = registro["data"]
+    return specs
+
+  def clear_specs_checkpoint(self) -> None:
+    """Se llama una vez que las fichas quedaron guardadas en MongoDB."""
+    SPECS_CHECKPOINT.unlink(missing_ok=True)
+
+  def get_specifications_cloudscraper(
+      self,
+      claves: List[str],
+      max_retries: int = 3,
+      sleep_seconds: float = 0.15,
+      max_workers: int = 8,
+      requests_per_second: float = 20.0
+  ) -> Dict[str, dict]:
+    """
+    Descarga fichas técnicas en paralelo con `max_workers` hilos. Todas las
+    peticiones pasan por un token bucket común de `requests_per_second`; un 403,
+    un 429 o una página de bloqueo pausa el bucket y aplica retroceso exponencial
+    al host. Los errores 5xx y de red se reintentan; los demás códigos no.
+    Cada ficha descargada se agrega al checkpoint para poder reanudar tras una
+    caída, y las claves que fallan se reportan en `SPECS_FAILURES`.
+    """
+    # El reporte de fallas es de esta ejecución; uno viejo confundiría el diagnóstico
+    SPECS_FAILURES.unlink(missing_ok=True)
+    specs = self._load_specs_checkpoint(set(claves))
+    if specs:
+      print(f"Recuperadas {len(specs)} fichas técnicas del checkpoint.")
+    pendientes = [clave for clave in dict.fromkeys(claves) if clave not in specs]
     errors = {}
-    for clave in claves:
-       retries = 0
-       success = False
-
-       while retries < max_retries and not success:
-            try:
-                payload = {'claveProducto': clave}
-                response = scraper.post(url, data=payload, timeout=5)  # timeout importante
-                content_type = response.headers.get('Content-Type', '').lower()
-
-                if response.status_code == 200:
-                    if 'application/json' in content_type:
-                        json_response = response.json()
-
-                        if isinstance(json_response, dict):
-                            respuesta = json_response.get("respuesta", {})
-                            if respuesta.get("status") == "success":
-                                specs[clave] = json_response
-                                success = True
-                                time.sleep(sleep_seconds)
-                                break
-                            else:
-                                raise ValueError(f"Respuesta no exitosa para clave {clave}")
-                        else:
-                            raise ValueError("Estructura de JSON inválida")
-                    elif '<html' in response.text.lower():
-                        raise ValueError("Respuesta HTML inesperada (posible bloqueo)")
-                    else:
-                        raise ValueError("Respuesta desconocida sin JSON")
-                elif response.status_code == 403:
-                    raise RuntimeError("403 Forbidden: IP bloqueada")
-                else:
-                    raise RuntimeError(f"HTTP error {response.status_code}")
-
-            except (requests.exceptions.RequestException, json.JSONDecodeError, cloudscraper.exceptions.CloudflareException) as e:
-                retries += 1
-                wait_time = min(1.5, sleep_seconds * (2 ** retries))  # backoff controlado
-                time.sleep(wait_time)
-                if retries == max_retries:
-                    errors[clave] = str(e)
-            except Exception as e:
-                errors[clave] = str(e)
-                break
+
+    host = urlparse(url).netloc
+    bucket = TokenBucket(rate=requests_per_second, capacity=max_workers)
+    backoff = HostBackoff()
+    checkpoint_lock = threading.Lock()
+
+    def fetch(clave: str):
+      retries = 0
+      while True:
+        bucket.acquire()
+        try:
+          data = self._fetch_specification(clave)
+          backoff.success(host)
+          return data
+        except BlockedError as e:
+          retries += 1
+          if retries >= max_retries:
+            raise
+          espera = backoff.blocked(host)
+          print(f"⚠️ Bloqueo de {host} ({e}); pausando {espera:.0f} s.")
+          bucket.pause(espera)
+        except (requests.exceptions.RequestException, json.JSONDecodeError, cloudscraper.exceptions.CloudflareException):
+          retries += 1
+          if retries >= max_retries:
+            raise
+          time.sleep(min(1.5, sleep_seconds * (2 ** retries)))  # backoff controlado
+
+    inicio = time.perf_counter()
+    with open(SPECS_CHECKPOINT, "a", encoding="utf-8") as checkpoint, ThreadPoolExecutor(max_workers=max_workers) as executor:
+      futures = {executor.submit(fetch, clave): clave for clave in pendientes}
+      for future in as_completed(futures):
+        clave = futures[future]
+        try:
+          specs[clave] = future.result()
+        except Exception as e:
+          errors[clave] = f"{type(e).__name__}: {e}"
+          continue
+        with checkpoint_lock:
+          checkpoint.write(json.dumps({"clave": clave, "data": specs[clave]}, ensure_ascii=False) + "\n")
+          checkpoint.flush()
+
+    duracion = time.perf_counter() - inicio
+    if pendientes:
+      print(f"Descargadas {len(pendientes) - len(errors)} fichas en {duracion:.1f} s ({len(pendientes) / duracion if duracion > 0 else 0:.1f} claves/s).")
 
     if errors:
-        print(f"⚠️ {len(errors)} claves fallaron al obtener ficha técnica.")
+        print(f"⚠️ {len(errors)} claves fallaron al obtener ficha técnica. Detalle en {SPECS_FAILURES}")
+        with open(SPECS_FAILURES, "w", encoding="utf-8") as f:
+          json.dump(errors, f, ensure_ascii=False, indent=2)
+    self.spec_errors = errors
 
     return specs
 
@@ -316,15 +445,7 @@ ORDER BY
       cnx = None
       cursor = None
       try:
-          cnx = mysql.connector.connect(
-              host=self.ip,
-              port=self.port,
-              user=self.user,
-              password=self.pwd,
-              database=self.database,
-              read_timeout=60,
-              write_timeout=15
-          )
+          cnx = get_connection()
           cursor = cnx.cursor(buffered=False)
           cursor.execute(query)
           claves_actuales = [row[0] for row in cursor.fetchall()]
@@ -1,21 +1,59 @@
+import json
+import shutil
+import math
+import time
+import uuid
+import faiss
+import hashlib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from langchain.schema import Document
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 from ct.ETL.transform import Transform
+from ct.ETL.rate_limit import TokenBucket
+from ct.ETL.embedding_cache import EmbeddingCache, CachedEmbeddings
 from ct.settings.clients import openai_api_key as api_key
+from ct.vectorstore.mapped import save_mapped, load_mapped
+from ct.vectorstore.lexical import save_lexical
+from ct.vectorstore.versions import new_version_dir, publish_version
 from ct.settings.config import (
     PRODUCTS_VECTOR_PATH, 
     SALES_VECTOR_PATH, 
-    SALES_PRODUCTS_VECTOR_PATH
+    SALES_PRODUCTS_VECTOR_PATH,
+    EMBEDDINGS_CACHE_PATH,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_WORKERS,
+    EMBEDDING_REQUESTS_PER_MINUTE,
+    EMBEDDING_TOKENS_PER_MINUTE,
+    VECTOR_INDEX_TYPE,
+    VECTOR_INDEX_NLIST,
+    VECTOR_INDEX_NPROBE,
+    VECTOR_INDEX_PQ_M,
+    VECTOR_INDEX_HNSW_M,
+    VECTOR_INDEX_EF_SEARCH
     )
 
 
 class Load:
     def __init__(self):
         self.clean_data = Transform()
-        self.embeddings = OpenAIEmbeddings(api_key=api_key)
+        # Solo los chunks nuevos o modificados llegan al API de OpenAI, y solo
+        # ellos se cobran del presupuesto
+        self.embeddings = CachedEmbeddings(
+            OpenAIEmbeddings(api_key=api_key),
+            EmbeddingCache(EMBEDDINGS_CACHE_PATH),
+            before_request=self._charge_budget
+        )
+        # Presupuesto compartido por todos los lotes que se embeben en paralelo
+        self.request_budget = TokenBucket(rate=EMBEDDING_REQUESTS_PER_MINUTE / 60, capacity=EMBEDDING_WORKERS)
+        self.token_budget = TokenBucket(rate=EMBEDDING_TOKENS_PER_MINUTE / 60, capacity=EMBEDDING_TOKENS_PER_MINUTE / 6)
         
         # Inicializamos el divisor de texto con los parámetros que necesitas
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -26,18 +64,22 @@ class Load:
             strip_whitespace = True
         )
 
-    def _create_documents_with_context(self, data: dict, collection_name: str) -> list[Document]:
+    @staticmethod
+    def _content_hash(contexto: str, informacion: str) -> str:
+        return hashlib.sha256(f"{contexto}\0{informacion}".encode("utf-8")).hexdigest()[:16]
+
+    def _create_documents_with_context(self, data: pd.DataFrame, collection_name: str) -> list[Document]:
         """
         Función genérica para crear documentos, dividirlos en chunks y 
         añadir contexto a cada uno.
         """
         all_docs = []
-        if not data:
+        if data is None or data.empty:
             return all_docs
 
-        for clave, content in data.items():
-            contexto = content.get("contexto", "")
-            texto_principal = content.get("informacion", "")
+        for clave, contexto, texto_principal in zip(data['clave'], data['contexto'], data['informacion']):
+            # Huella del contenido: permite detectar productos modificados en `sync_products`
+            content_hash = self._content_hash(contexto, texto_principal)
 
             # Dividimos el contenido principal en chunks
             chunks = self.text_splitter.split_text(texto_principal)
@@ -48,7 +90,7 @@ class Load:
                 
                 doc = Document(
                     page_content=page_content_with_context,
-                    metadata={"collection": collection_name, "clave": clave}
+                    metadata={"collection": collection_name, "clave": clave, "hash": content_hash}
                 )
                 all_docs.append(doc)
         
@@ -60,7 +102,7 @@ class Load:
         """
         ids_validos = self.clean_data.data.get_valid_ids()
         products_data = self.clean_data.clean_products(ids_validos)
-        if not products_data:
+        if products_data.empty:
             print("Advertencia: No hay productos para cargar.")
             return []
 
@@ -74,7 +116,7 @@ class Load:
         """
         sales_raw = self.clean_data.data.get_current_sales()
         sales_data = self.clean_data.clean_sales(sales_raw)
-        if not sales_data:
+        if sales_data.empty:
             print("Advertencia: No hay ofertas para cargar.")
             return []
 
@@ -82,15 +124,111 @@ class Load:
         print(f"Se generaron {len(docs)} documentos (chunks) para ofertas.")
         return docs
     
+    def _charge_budget(self, textos: list[str]) -> None:
+        """Espera turno en el presupuesto de peticiones y tokens para los textos que van al API."""
+        self.request_budget.acquire()
+        self.token_budget.acquire(sum(len(texto) for texto in textos) / 4)
+
+    def _embed_batch(self, textos: list[str], max_retries: int = 5) -> list[list[float]]:
+        """
+        Embebe un lote. El presupuesto se cobra dentro de `CachedEmbeddings`
+        solo por los textos que no estaban en caché, así que un lote resuelto
+        por completo desde el caché no espera al límite del API.
+        Si falla, reintenta solo este lote con retroceso exponencial.
+        """
+        for intento in range(1, max_retries + 1):
+            try:
+                return self.embeddings.embed_documents(textos)
+            except Exception as e:
+                if intento == max_retries:
+                    raise
+                espera = min(60, 2 ** intento)
+                print(f"⚠️ Falló un lote de {len(textos)} documentos ({e}); reintento {intento} en {espera} s.")
+                time.sleep(espera)
+
+    def embed_documents(self, docs: list[Document], batch_size: int = EMBEDDING_BATCH_SIZE) -> np.ndarray:
+        """
+        Etapa productor/consumidor: los lotes se envían a `EMBEDDING_WORKERS` hilos
+        (con a lo sumo el doble de lotes en vuelo) y cada resultado se escribe en su
+        posición de una matriz preasignada, sin importar el orden en que terminen.
+        """
+        textos = [doc.page_content for doc in docs]
+        total_docs = len(textos)
+        lotes = ((inicio, textos[inicio:inicio + batch_size]) for inicio in range(0, total_docs, batch_size))
+        vectores = None
+        procesados = 0
+
+        with ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS) as executor:
+            en_vuelo = {}
+            while True:
+                # Productor: mantiene la cola de lotes llena sin materializarlos todos
+                while len(en_vuelo) < EMBEDDING_WORKERS * 2:
+                    siguiente = next(lotes, None)
+                    if siguiente is None:
+                        break
+                    inicio, lote = siguiente
+                    en_vuelo[executor.submit(self._embed_batch, lote)] = inicio
+                if not en_vuelo:
+                    break
+
+                # Consumidor: coloca cada lote terminado en su lugar
+                terminados, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                for future in terminados:
+                    inicio = en_vuelo.pop(future)
+                    lote_vectores = np.asarray(future.result(), dtype=np.float32)
+                    if vectores is None:
+                        vectores = np.empty((total_docs, lote_vectores.shape[1]), dtype=np.float32)
+                    vectores[inicio:inicio + len(lote_vectores)] = lote_vectores
+                    procesados += len(lote_vectores)
+                    print(f"Procesados {procesados} de {total_docs} documentos.")
+
+        return vectores
+
     def vector_store(self, docs: list[Document]) -> FAISS:
         """
-        Crea un vector store de FAISS a partir de los documentos.
+        Crea un vector store de FAISS a partir de los documentos. Los embeddings se
+        calculan en paralelo y se agregan al índice de una sola vez.
         """
         if not docs:
             print("Advertencia: No hay documentos para crear el vector store.")
             return None
-        vector_store = FAISS.from_documents(docs, self.embeddings)
+        vectores = self.embed_documents(docs)
+
+        index = faiss.IndexFlatL2(vectores.shape[1])
+        index.add(vectores)
+        ids = [str(uuid.uuid4()) for _ in docs]
+        vector_store = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(dict(zip(ids, docs))),
+            index_to_docstore_id=dict(enumerate(ids))
+        )
         return vector_store
+
+    def add_documents(self, vector_store: FAISS, docs: list[Document]) -> None:
+        """Agrega documentos a un vector store existente usando el embebido en paralelo."""
+        if not docs:
+            return
+        vectores = self.embed_documents(docs)
+        vector_store.add_embeddings(
+            zip([doc.page_content for doc in docs], vectores),
+            metadatas=[doc.metadata for doc in docs]
+        )
+
+    def extend_vector_store(self, vector_store: FAISS, docs: list[Document]) -> FAISS:
+        """
+        Inserta un lote de documentos: crea el vector store con el primer lote y
+        agrega los siguientes al mismo índice.
+        """
+        if vector_store is None:
+            return self.vector_store(docs)
+        self.add_documents(vector_store, docs)
+        return vector_store
+
+    def _print_cache_stats(self):
+        total = self.embeddings.hits + self.embeddings.misses
+        if total:
+            print(f"Caché de embeddings: {self.embeddings.hits} reutilizados, {self.embeddings.misses} nuevos ({self.embeddings.hits / total:.0%} aciertos).")
     
     def products_vs(self, products: list[Document]):
         """
@@ -100,23 +238,11 @@ class Load:
             print("No hay productos para crear el vector store.")
             return
 
-        batch_size = 500
-        total_docs = len(products)
-        
-        if total_docs == 0:
-            print("No hay documentos de productos para procesar.")
-            return
-            
-        vector_store = self.vector_store(products[:batch_size])
+        vector_store = self.vector_store(products)
         if vector_store:
-            for i in range(batch_size, total_docs, batch_size):
-                batch = products[i:i + batch_size]
-                if batch:
-                    vector_store.add_documents(batch)
-                    print(f"Procesados {i + len(batch)} de {total_docs} documentos de productos.")
-        
             vector_store.save_local(str(PRODUCTS_VECTOR_PATH))
             print("Vector store de productos creado y guardado en disco.")
+            self._print_cache_stats()
         else:
             print("No se pudo crear el vector store de productos.")
 
@@ -128,46 +254,152 @@ class Load:
         if not sales:
             print("No hay ventas para crear el vector store.")
             return
-            
-        batch_size = 500
-        total_docs = len(sales)
-        if total_docs == 0:
-            print("No hay documentos de ventas para procesar.")
-            return
 
-        vector_store = self.vector_store(sales[:batch_size])
+        vector_store = self.vector_store(sales)
         if vector_store:
-            for i in range(batch_size, total_docs, batch_size):
-                batch = sales[i:i + batch_size]
-                if batch:
-                    vector_store.add_documents(batch)
-                    print(f"Procesados {i + len(batch)} de {total_docs} documentos de productos.")
-        
             vector_store.save_local(str(SALES_VECTOR_PATH))
-            print("Vector store de productos creado y guardado en disco.")
+            print("Vector store de ofertas creado y guardado en disco.")
+            self._print_cache_stats()
         else:
-            print("No se pudo crear el vector store de productos.")
+            print("No se pudo crear el vector store de ofertas.")
 
-    def sales_products_vs(self):
-        products_vs = FAISS.load_local(
-            folder_path=str(PRODUCTS_VECTOR_PATH),
-            embeddings=OpenAIEmbeddings(openai_api_key=api_key),
-            allow_dangerous_deserialization=True
-        )
-        sales_vs = FAISS.load_local(
-            folder_path=str(SALES_VECTOR_PATH),
-            embeddings=OpenAIEmbeddings(openai_api_key=api_key),
+    def _validate_vector_store(self, path) -> None:
+        """
+        Verifica que una versión recién construida se pueda abrir (igual que lo
+        harán los workers) y sea consistente antes de publicarla.
+        """
+        vector_store = load_mapped(path, self.embeddings)
+        total = vector_store.index.ntotal
+        if total == 0:
+            raise ValueError(f"El vector store en {path} está vacío.")
+        if total != len(vector_store.docstore):
+            raise ValueError(f"El vector store en {path} es inconsistente: {total} vectores, {len(vector_store.docstore)} documentos.")
+
+    def build_search_index(self, vectores: np.ndarray, index_type: str = VECTOR_INDEX_TYPE) -> tuple[faiss.Index, dict]:
+        """
+        Construye el índice de búsqueda del vector store publicado a partir de los
+        vectores ya calculados. Devuelve el índice y sus parámetros.
+        """
+        total, dim = vectores.shape
+        # Los índices IVF necesitan ~39 vectores de entrenamiento por centroide y
+        # PQ de 8 bits entrena 256 centroides por subcuantizador: con menos
+        # vectores (soporte, promociones) se usa búsqueda exacta
+        minimo = {"ivf": 39, "ivfpq": 256}.get(index_type, 0)
+        if total < minimo:
+            print(f"Solo hay {total} vectores, menos de los {minimo} que necesita {index_type}; se usa índice flat.")
+            index, params = self.build_search_index(vectores, "flat")
+            params["requested_index_type"] = index_type
+            return index, params
+
+        params = {"index_type": index_type}
+
+        if index_type == "flat":
+            index = faiss.IndexFlatL2(dim)
+        elif index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, VECTOR_INDEX_HNSW_M)
+            index.hnsw.efSearch = VECTOR_INDEX_EF_SEARCH
+            params.update(M=VECTOR_INDEX_HNSW_M, efSearch=VECTOR_INDEX_EF_SEARCH)
+        elif index_type in ("ivf", "ivfpq"):
+            # FAISS necesita ~39 vectores de entrenamiento por centroide
+            nlist = VECTOR_INDEX_NLIST or int(4 * math.sqrt(total))
+            nlist = max(1, min(nlist, total // 39))
+            quantizer = faiss.IndexFlatL2(dim)
+            if index_type == "ivf":
+                index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+            else:
+                # El número de subcuantizadores debe dividir la dimensión
+                pq_m = max(m for m in range(1, VECTOR_INDEX_PQ_M + 1) if dim % m == 0)
+                index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, 8)
+                params["pq_m"] = pq_m
+            index.train(vectores)
+            index.nprobe = min(VECTOR_INDEX_NPROBE, nlist)
+            params.update(nlist=nlist, nprobe=index.nprobe)
+        else:
+            raise ValueError(f"Tipo de índice no soportado: {index_type}")
+
+        index.add(vectores)
+        if index_type in ("ivf", "ivfpq"):
+            # La búsqueda MMR reconstruye vectores por posición
+            index.make_direct_map()
+        return index, params
+
+    def measure_recall(self, index: faiss.Index, vectores: np.ndarray, k: int = 10, queries: int = 200) -> float:
+        """
+        Recall@k del índice contra la búsqueda exacta, usando como consultas una
+        muestra de los propios vectores.
+        """
+        exacto = faiss.IndexFlatL2(vectores.shape[1])
+        exacto.add(vectores)
+        rng = np.random.default_rng(0)
+        muestra = vectores[rng.choice(len(vectores), size=min(queries, len(vectores)), replace=False)]
+        k = min(k, len(vectores))
+        _, esperados = exacto.search(muestra, k)
+        _, obtenidos = index.search(muestra, k)
+        aciertos = sum(len(set(e) & set(o)) for e, o in zip(esperados, obtenidos))
+        return aciertos / (len(muestra) * k)
+
+    def _build_partition(self, source_path, version_dir) -> dict | None:
+        """
+        Reconstruye el índice de búsqueda de una colección y la guarda, junto con
+        su índice léxico, en su propio directorio dentro de la versión. Devuelve
+        los datos de construcción, o None si la colección no tiene documentos
+        (por ejemplo, sin promociones activas); en ese caso no se crea el directorio.
+        """
+        if not (Path(source_path) / "index.faiss").exists():
+            return None
+        vector_store = FAISS.load_local(
+            folder_path=str(source_path),
+            embeddings=self.embeddings,
             allow_dangerous_deserialization=True
         )
+        if vector_store.index.ntotal == 0:
+            return None
+
+        inicio = time.perf_counter()
+        vectores = vector_store.index.reconstruct_n(0, vector_store.index.ntotal)
+        index, build_info = self.build_search_index(vectores)
+        build_info["build_seconds"] = round(time.perf_counter() - inicio, 2)
+        build_info["vectors"] = int(index.ntotal)
+        build_info["recall_at_10"] = self.measure_recall(index, vectores) if build_info["index_type"] != "flat" else 1.0
+        vector_store.index = index
+
+        save_mapped(vector_store, version_dir)
+        # Índice BM25 de los mismos chunks para las búsquedas por clave o modelo
+        save_lexical(version_dir)
+        self._validate_vector_store(version_dir)
+        return build_info
+
+    def sales_products_vs(self):
+        """
+        Publica una versión con un vector store independiente por colección, de
+        modo que cada retriever busca solo en su partición sin filtrar metadata.
+        """
+        # Se construye en una versión nueva y solo se publica si pasa la validación
+        version_dir = new_version_dir(SALES_PRODUCTS_VECTOR_PATH)
+        build_info = {}
+        for collection, source_path in (("productos", PRODUCTS_VECTOR_PATH), ("promociones", SALES_VECTOR_PATH)):
+            info = self._build_partition(source_path, version_dir / collection)
+            if info is None:
+                # Una colección vacía no se publica; el retriever busca solo en las que existen
+                build_info[collection] = {"skipped": "sin documentos"}
+                print(f"Partición {collection} omitida: no tiene documentos.")
+                continue
+            build_info[collection] = info
+            print(f"Partición {collection} construida con índice {info['index_type']}: {info}")
 
-        products_vs.merge_from(sales_vs)
-        products_vs.save_local(str(SALES_PRODUCTS_VECTOR_PATH))
-        return print("Vector store de productos y ofertas creado y guardado en disco.")
+        if all("skipped" in info for info in build_info.values()):
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise ValueError("Ninguna colección tiene documentos; no se publica una versión vacía.")
+
+        with open(version_dir / "build_info.json", "w", encoding="utf-8") as f:
+            json.dump(build_info, f, indent=2)
+        publish_version(SALES_PRODUCTS_VECTOR_PATH, version_dir)
+        return print(f"Vector store de productos y ofertas creado y publicado ({version_dir.name}).")
 
     def add_products(self):
         productos_vectorstore = FAISS.load_local(
             folder_path=str(PRODUCTS_VECTOR_PATH),
-            embeddings=OpenAIEmbeddings(openai_api_key=api_key),
+            embeddings=self.embeddings,
             allow_dangerous_deserialization=True
         )
 
@@ -180,9 +412,65 @@ class Load:
         
         docs = self._create_documents_with_context(new_products, 'productos')
 
-        productos_vectorstore.add_documents(docs)
+        self.add_documents(productos_vectorstore, docs)
 
         productos_vectorstore.save_local(str(PRODUCTS_VECTOR_PATH))
         print(f"Cantidad de documentos nuevos agregados: {len(docs)}")
         return True
-    
\ No newline at end of file
+
+    def sync_products(self) -> bool:
+        """
+        Sincroniza el vector store de productos con el catálogo actual de MySQL
+        sin reconstruirlo completo:
+        - borra los vectores de claves que ya no son válidas (inactivas o sin precio),
+        - vuelve a embeber las claves cuyo contenido cambió (según su hash),
+        - agrega las claves nuevas.
+        Devuelve True si hubo cambios.
+        """
+        productos_vectorstore = FAISS.load_local(
+            folder_path=str(PRODUCTS_VECTOR_PATH),
+            embeddings=self.embeddings,
+            allow_dangerous_deserialization=True
+        )
+
+        ids_por_clave = defaultdict(list)
+        hash_por_clave = {}
+        for doc_id, doc in productos_vectorstore.docstore._dict.items():
+            clave = doc.metadata["clave"]
+            ids_por_clave[clave].append(doc_id)
+            hash_por_clave[clave] = doc.metadata.get("hash")
+
+        ids_validos = self.clean_data.data.get_valid_ids()
+        if not ids_validos:
+            # Un error de MySQL no debe interpretarse como "todo el catálogo se desactivó"
+            print("Advertencia: No se pudo leer el catálogo actual. No se sincroniza.")
+            return False
+        catalogo = self.clean_data.clean_products(ids_validos)
+        hash_actual = dict(zip(
+            catalogo['clave'],
+            [self._content_hash(c, i) for c, i in zip(catalogo['contexto'], catalogo['informacion'])]
+        ))
+
+        eliminadas = [clave for clave in ids_por_clave if clave not in hash_actual]
+        modificadas = [clave for clave, h in hash_actual.items() if clave in hash_por_clave and hash_por_clave[clave] != h]
+        nuevas = [clave for clave in hash_actual if clave not in ids_por_clave]
+        print(f"Sincronización de productos: {len(nuevas)} nuevas, {len(modificadas)} modificadas, {len(eliminadas)} eliminadas.")
+
+        if not (eliminadas or modificadas or nuevas):
+            return False
+
+        ids_a_borrar = [doc_id for clave in eliminadas + modificadas for doc_id in ids_por_clave[clave]]
+        if ids_a_borrar:
+            productos_vectorstore.delete(ids_a_borrar)
+
+        docs = self._create_documents_with_context(
+            catalogo[catalogo['clave'].isin(set(modificadas + nuevas))],
+            'productos'
+        )
+        if docs:
+            self.add_documents(productos_vectorstore, docs)
+
+        productos_vectorstore.save_local(str(PRODUCTS_VECTOR_PATH))
+        print(f"Vectores eliminados: {len(ids_a_borrar)}, documentos agregados: {len(docs)}")
+        self._print_cache_stats()
+        return True
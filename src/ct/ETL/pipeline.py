@@ -1,19 +1,58 @@
+import time
+import mysql.connector
+from typing import Iterator
+from langchain.schema import Document
 from ct.ETL.load import Load
+from ct.settings.config import PRODUCTS_VECTOR_PATH
+from ct.settings.tool_cache import invalidate_tool_caches
+from ct.tools.promotion_rules import mark_promotions_changed
 
 load = Load()
 
-def load_products():
+def stream_product_documents(chunk_size: int = 2000) -> Iterator[list[Document]]:
+    """
+    Modo streaming del pipeline de productos. Cada lote de `chunk_size` ids fluye
+    por extracción → fichas técnicas → chunking y se entrega como lista de
+    documentos, así que nunca se materializa el catálogo completo en memoria.
+    """
+    ids_validos = load.clean_data.data.get_valid_ids()
+    if not ids_validos:
+        print("Advertencia: No hay productos para cargar.")
+        return
+
+    for productos in load.clean_data.data.iter_products(ids_validos, batch_size=chunk_size):
+        documentos = load.clean_data.clean_products_frame(productos)
+        docs = load._create_documents_with_context(documentos, 'productos')
+        if docs:
+            yield docs
+
+def load_products(chunk_size: int = 2000):
     """
     Actualiza únicamente el vector store de productos.
-    Extrae y transforma los productos y actualiza su vector store.
+    Extrae y transforma los productos por lotes y cada lote se embebe e inserta
+    en el índice en cuanto está listo.
     """
     print("\n--- Actualizando productos ---")
-    products_docs = load.load_products()
-    if products_docs:
-        load.products_vs(products_docs)
+    inicio = time.perf_counter()
+    vector_store = None
+    total_docs = 0
+    try:
+        for docs in stream_product_documents(chunk_size):
+            vector_store = load.extend_vector_store(vector_store, docs)
+            total_docs += len(docs)
+            print(f"{total_docs} documentos de productos indexados ({time.perf_counter() - inicio:.1f} s).")
+    except mysql.connector.Error as err:
+        # El catálogo quedó incompleto: se conserva el vector store publicado
+        print(f"La extracción de productos se interrumpió tras {total_docs} documentos: {err}")
+        return False
+
+    if vector_store:
+        vector_store.save_local(str(PRODUCTS_VECTOR_PATH))
+        load._print_cache_stats()
         print("✅ Vector store de productos actualizado correctamente.")
-    else:
-        print("No se pudo actualizar el vector store de productos.")
+        return True
+    print("No se pudo actualizar el vector store de productos.")
+    return False
 
 def update_products():
     """
@@ -22,6 +61,18 @@ def update_products():
     flag = load.add_products()
     return flag
 
+def sync_products():
+    """
+    Sincroniza el vector store de productos con el catálogo: agrega nuevos,
+    re-embebe modificados y elimina los que ya no están activos.
+    Pensado para ejecutarse cada pocos minutos.
+    """
+    flag = load.sync_products()
+    if flag:
+        # El catálogo cambió: inventario y promociones en caché ya no son confiables
+        invalidate_tool_caches()
+    return flag
+
 def load_sales():
     """
     Actualiza únicamente el vector store de ventas (ofertas).
@@ -32,6 +83,8 @@ def load_sales():
     sales_docs = load.load_sales()
     if sales_docs:
         load.sales_vs(sales_docs)
+        invalidate_tool_caches()
+        mark_promotions_changed()
         print("✅ Vector store de ventas (ofertas) actualizado correctamente.")
     else:
         print("No se pudo actualizar el vector store de ventas.")
@@ -49,12 +102,9 @@ def update_all():
     print("\n=== Actualizando productos y ventas (pipeline completo) ===")
 
     # Productos
-    print("\n--- Procesando productos ---")
-    products_docs = load.load_products()
-    if not products_docs:
+    if not load_products():
         print("El pipeline de productos no se pudo completar. Saliendo.")
         return
-    load.products_vs(products_docs)
 
     # Ventas
     print("\n--- Procesando ventas (ofertas) ---")
@@ -62,7 +112,9 @@ def update_all():
     if not sales_docs:
         print("El pipeline de ventas no se pudo completar. Saliendo.")
         return
-    load.sales_products_vs(sales_docs)
+    load.sales_vs(sales_docs)
+    load.sales_products_vs()
+    invalidate_tool_caches()
+    mark_promotions_changed()
 
     print("\n✅ Pipeline completo (productos y ventas) actualizado exitosamente.")
-
@@ -0,0 +1,80 @@
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    Limitador de tasa compartido entre hilos.
+
+    Se rellena a `rate` fichas por segundo hasta `capacity`. `acquire` bloquea
+    hasta que haya fichas suficientes, y `pause` detiene a todos los
+    consumidores hasta que pase el tiempo indicado (por ejemplo tras un 403).
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        # Una petición mayor que la capacidad nunca se podría servir: se limita
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class HostBackoff:
+    """
+    Retroceso exponencial por host. Cada bloqueo consecutivo duplica la espera
+    (hasta `max_delay`) y una respuesta exitosa la reinicia.
+
+    Un mismo bloqueo lo reportan todos los hilos que tenían una petición en
+    vuelo: mientras el host sigue en pausa esos reportes no cuentan como un
+    bloqueo nuevo, solo devuelven lo que falta de la pausa actual.
+    """
+
+    def __init__(self, base_delay: float = 5.0, max_delay: float = 120.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._failures = {}
+        self._paused_until = {}
+        self._lock = threading.Lock()
+
+    def blocked(self, host: str) -> float:
+        """Registra un bloqueo del host y devuelve cuántos segundos hay que esperar."""
+        with self._lock:
+            now = time.monotonic()
+            paused_until = self._paused_until.get(host, 0.0)
+            if now < paused_until:
+                return paused_until - now
+            self._failures[host] = self._failures.get(host, 0) + 1
+            delay = min(self.max_delay, self.base_delay * (2 ** (self._failures[host] - 1)))
+            self._paused_until[host] = now + delay
+            return delay
+
+    def success(self, host: str) -> None:
+        with self._lock:
+            self._failures.pop(host, None)
+            self._paused_until.pop(host, None)
@@ -1,6 +1,7 @@
 import pandas as pd
 from ct.ETL.extraction import Extraction
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import OperationFailure
 from ct.settings.clients import mongo_db, mongo_collection_specifications 
 
 
@@ -10,6 +11,23 @@ class Transform:
         self.client = MongoClient("mongodb://localhost:27017")
         self.db = self.client[mongo_db]
         self.specifications_collection = self.db[mongo_collection_specifications]
+        self._ensure_clave_index()
+
+    def _ensure_clave_index(self):
+        """
+        Índice sobre `clave` para las consultas `$in`. Se intenta único; si la
+        colección ya tiene claves duplicadas (o existe otro índice sobre `clave`)
+        se avisa y se sigue con un índice normal, sin detener el ETL.
+        """
+        try:
+            self.specifications_collection.create_index("clave", unique=True)
+            return
+        except OperationFailure as e:
+            print(f"⚠️ No se pudo crear el índice único de clave en {self.specifications_collection.name}: {e}")
+        try:
+            self.specifications_collection.create_index("clave", name="clave_lookup")
+        except OperationFailure as e:
+            print(f"⚠️ Se continúa sin índice de clave en {self.specifications_collection.name}: {e}")
 
     def extract_features(self, specifications):
         """
@@ -62,19 +80,25 @@ class Transform:
                         print(f"Advertencia: La clave {clave_producto} no tiene un formato esperado y será omitida.")
         return fichas_tecnicas
     
-    def _get_all_specifications(self, claves: list) -> dict:
+    def _get_all_specifications(self, claves: list, batch_size: int = 5000) -> dict:
         """
         Método privado para obtener fichas técnicas, tanto de la BD como nuevas.
+        Las existentes se leen con consultas `$in` por lotes (apoyadas en el índice
+        único de `clave`) y las nuevas se guardan con un solo `bulk_write`.
         """
-        claves_a_buscar = []
+        claves = list(dict.fromkeys(claves))
         fichas_tecnicas_existentes = {}
 
-        for clave in claves:
-            ficha_existente = self.specifications_collection.find_one({"clave": clave})
-            if ficha_existente:
-                fichas_tecnicas_existentes[clave] = ficha_existente.get('data', {})
-            else:
-                claves_a_buscar.append(clave)
+        for i in range(0, len(claves), batch_size):
+            lote = claves[i:i + batch_size]
+            cursor = self.specifications_collection.find(
+                {"clave": {"$in": lote}},
+                {"_id": 0, "clave": 1, "data": 1}
+            )
+            for ficha_existente in cursor:
+                fichas_tecnicas_existentes[ficha_existente["clave"]] = ficha_existente.get('data', {})
+
+        claves_a_buscar = [clave for clave in claves if clave not in fichas_tecnicas_existentes]
 
         new_specs = {}
         if claves_a_buscar:
@@ -82,13 +106,14 @@ class Transform:
             raw_new_specs = self.data.get_specifications(claves_a_buscar)
             new_specs = self.transform_specifications(raw_new_specs)
 
-            for clave, data in new_specs.items():
-                self.specifications_collection.update_one(
-                    {"clave": clave},
-                    {"$set": {"clave": clave, "data": data}},
-                    upsert=True
-                )
+            if new_specs:
+                operaciones = [
+                    UpdateOne({"clave": clave}, {"$set": {"clave": clave, "data": data}}, upsert=True)
+                    for clave, data in new_specs.items()
+                ]
+                self.specifications_collection.bulk_write(operaciones, ordered=False)
             print(f"Guardadas {len(new_specs)} fichas técnicas nuevas en MongoDB.")
+            self.data.clear_specs_checkpoint()
         
         return {**fichas_tecnicas_existentes, **new_specs}
 
@@ -97,6 +122,13 @@ class Transform:
         Transforma los datos brutos de productos en un DataFrame limpio y estandarizado.
         """
         products = self.data.get_products(ids_validos)
+        return self.transform_products_frame(products)
+
+    def transform_products_frame(self, products: pd.DataFrame) -> pd.DataFrame:
+        """
+        Igual que `transform_products`, pero sobre un DataFrame ya extraído
+        (por ejemplo, un lote del modo streaming).
+        """
         cols_to_clean = ['descripcion', 'descripcion_corta', 'palabrasClave']
         for col in cols_to_clean:
             products[col] = products[col].fillna('').astype(str).replace('0', '').str.strip()
@@ -118,48 +150,69 @@ class Transform:
         final_cols = ['clave', 'contexto', 'informacion']
         return products[final_cols].copy()
     
-    def clean_products(self, ids_validos) -> dict:
+    def _summarize_specifications(self, fichas_tecnicas: dict) -> tuple[dict, dict]:
+        """
+        Convierte cada ficha técnica una sola vez en sus dos fragmentos de texto:
+        el resumen y la lista de características.
+        """
+        resumenes = {}
+        detalles = {}
+        for clave, ficha in fichas_tecnicas.items():
+            if not ficha:
+                continue
+            resumen = ficha.get('resumen', {})
+            if resumen:
+                resumen_texto = f"{resumen.get('ShortSummary', '')} {resumen.get('LongSummary', '')}".strip()
+                if resumen_texto and resumen_texto != "No disponible":
+                    resumenes[clave] = resumen_texto
+
+            detalles_ficha = ficha.get('fichaTecnica', {})
+            if detalles_ficha:
+                detalles[clave] = ", ".join([f"{k}: {v}" for k, v in detalles_ficha.items()]) + "."
+        return resumenes, detalles
+
+    def _build_documents(self, data: pd.DataFrame, sufijo_informacion: str = "") -> pd.DataFrame:
+        """
+        Arma el texto final de cada producto con operaciones de columnas de pandas:
+        la información base, el resumen y las características de la ficha se mapean
+        por clave y se concatenan omitiendo las partes vacías.
+        Devuelve un DataFrame con `clave`, `contexto` e `informacion` (una fila por clave).
+        """
+        data = data.drop_duplicates(subset='clave', keep='last')
+        claves = data['clave'].unique().tolist()
+        resumenes, detalles = self._summarize_specifications(self._get_all_specifications(claves))
+
+        informacion = data['informacion'].fillna('').astype(str)
+        partes = [
+            informacion.where(informacion == '', informacion + sufijo_informacion),
+            data['clave'].map(resumenes).fillna(''),
+            data['clave'].map(detalles).fillna(''),
+        ]
+        # Cada parte no vacía aporta su texto más un espacio; al final se quita el sobrante
+        texto = pd.Series('', index=data.index)
+        for parte in partes:
+            texto = texto + parte.where(parte == '', parte + ' ')
+
+        return pd.DataFrame({
+            'clave': data['clave'],
+            'contexto': data['contexto'],
+            'informacion': texto.str.removesuffix(' ')
+        }).reset_index(drop=True)
+
+    def clean_products(self, ids_validos) -> pd.DataFrame:
         """
         Limpia los datos, separa la información de contexto del contenido principal
-        y devuelve un diccionario listo para ser procesado y chunked.
+        y devuelve un DataFrame listo para ser procesado y chunked.
         """
         products = self.transform_products(ids_validos)
+        return self._build_documents(products)
 
-        claves = products['clave'].unique().tolist()
-        all_fichas_tecnicas = self._get_all_specifications(claves)
-
-        documentos_finales = {}
-        for index, row in products.iterrows():
-            clave = row['clave']
-            
-            # La información clave que queremos repetir en cada chunk
-            informacion_contexto = row['contexto']
-            
-            contenido_parts = []
-
-            if row['informacion']:
-                contenido_parts.append(f"{row['informacion']}")
-
-            ficha = all_fichas_tecnicas.get(clave)
-            if ficha:
-                resumen = ficha.get('resumen', {})
-                if resumen:
-                    resumen_texto = f"{resumen.get('ShortSummary', '')} {resumen.get('LongSummary', '')}".strip()
-                    if resumen_texto and resumen_texto != "No disponible":
-                        contenido_parts.append(f"{resumen_texto}")
-                
-                detalles_ficha = ficha.get('fichaTecnica', {})
-                if detalles_ficha:
-                    detalles_str = ", ".join([f"{k}: {v}" for k, v in detalles_ficha.items()])
-                    contenido_parts.append(f"{detalles_str}.")
-
-            # Guardamos el contexto y el contenido por separado
-            documentos_finales[clave] = {
-                "contexto": informacion_contexto,
-                "informacion": " ".join(contenido_parts)
-            }
-            
-        return documentos_finales
+    def clean_products_frame(self, products_raw: pd.DataFrame) -> pd.DataFrame:
+        """
+        Versión de `clean_products` para un lote de productos ya extraído.
+        """
+        products = self.transform_products_frame(products_raw)
+        return self._build_documents(products)
 
     def transform_sales(self, sales_raw: pd.DataFrame) -> pd.DataFrame:
         """
@@ -189,44 +242,13 @@ class Transform:
         final_cols = ['clave', 'contexto', 'informacion']
         return sales_raw[final_cols].copy()
 
-    def clean_sales(self, sales_raw: pd.DataFrame) -> dict:
+    def clean_sales(self, sales_raw: pd.DataFrame) -> pd.DataFrame:
         """
         Limpia los datos de ventas, separando la información de contexto del contenido,
         similar a clean_products.
         """
         sales = self.transform_sales(sales_raw)
         if sales.empty:
-            return {}
-
-        claves = sales['clave'].unique().tolist()
-        all_fichas_tecnicas = self._get_all_specifications(claves)
-
-        documentos_finales = {}
-        for index, row in sales.iterrows():
-            clave = row['clave']
-            
-            informacion_contexto = row['contexto']
-            contenido_parts = [] 
-
-            if row['informacion']:
-                contenido_parts.append(f"{row['informacion']}.")
-
-            ficha = all_fichas_tecnicas.get(clave)
-            if ficha:
-                resumen = ficha.get('resumen', {})
-                if resumen:
-                    resumen_texto = f"{resumen.get('ShortSummary', '')} {resumen.get('LongSummary', '')}".strip()
-                    if resumen_texto and resumen_texto != "No disponible":
-                        contenido_parts.append(f"{resumen_texto}")
-                
-                detalles_ficha = ficha.get('fichaTecnica', {})
-                if detalles_ficha:
-                    detalles_str = ", ".join([f"{k}: {v}" for k, v in detalles_ficha.items()])
-                    contenido_parts.append(f"{detalles_str}.")
-
-            documentos_finales[clave] = {
-                "contexto": informacion_contexto,
-                "informacion": " ".join(contenido_parts)
-            }
-            
-        return documentos_finales
+            return pd.DataFrame(columns=['clave', 'contexto', 'informacion'])
+
+        return self._build_documents(sales, sufijo_informacion='.')
@@ -1,4 +1,4 @@
-from ct.ETL.pipeline import update_products, load_sales_products
+from ct.ETL.pipeline import sync_products, load_sales_products
 from ct.settings.clients import reload_vectors_post
 import requests
 import urllib3
@@ -6,10 +6,10 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
 if __name__ == "__main__":
-    changed = update_products()
+    changed = sync_products()
     if changed == True:
         load_sales_products()  # merge de productos y ofertas
         print("Vector store regenerado. Notificando servidor...")
         requests.post(reload_vectors_post, timeout=10, verify=False)
     else:
-        print("No hay nuevos productos. Nada que recargar.")
+        print("No hay cambios en productos. Nada que recargar.")
@@ -1,7 +1,21 @@
+import re
 from typing import AsyncGenerator
 from ct.settings.cache import set_llm_cache
+from ct.settings.executor import run_blocking
 from ct.langchain.tool_agent import ToolAgent
 from ct.moderation.query_moderator import QueryModerator
+from ct.tools.search_information import find_claves, search_by_key_tool
+
+
+# Palabras de dos o más letras: si queda alguna después de quitar las claves el mensaje se modera
+_PALABRA = re.compile(r"[^\W\d_]{2,}")
+
+def only_claves(query: str, claves: list[str]) -> bool:
+    """True si el mensaje no tiene más que las claves (y signos o conectores de una letra)."""
+    resto = query
+    for clave in claves:
+        resto = re.sub(re.escape(clave), " ", resto, flags=re.IGNORECASE)
+    return not _PALABRA.search(resto)
 
 
 class ModeratedToolAgent:
@@ -13,26 +27,38 @@ class ModeratedToolAgent:
     async def run(self, query: str, session_id: str = None, listaPrecio : str = None) -> AsyncGenerator[str, None]:
         """Ejecuta una consulta RAG y muestra los chunks de respuesta en tiempo real."""
 
-        session = self.tool_agent.ensure_session(session_id)
-        ban_message = self.moderator.check_if_banned(session)
+        # pymongo, FAISS y el docstore son síncronos: todo va al pool de hilos
+        session = await run_blocking(self.tool_agent.ensure_session, session_id)
+        ban_message = await run_blocking(self.moderator.check_if_banned, session)
         if ban_message:
             yield ban_message
             return
 
-        label = self.moderator.classify_query(query, session_id=session_id).strip().lower()
+        # Pre-ruteo: la búsqueda por clave se resuelve aquí, sin embeddings. Solo un
+        # mensaje que no trae más que claves válidas se da por relevante sin clasificar;
+        # si trae texto, pasa por la moderación como cualquier otro y las claves se
+        # buscan solo si resulta relevante.
+        claves = find_claves(query)
+        if claves and only_claves(query, claves):
+            label = "relevante"
+        else:
+            label = (await self.moderator.aclassify_query(query, session_id=session_id)).strip().lower()
 
         if label == "relevante":
-            async for chunk in self.tool_agent.run(query, session_id, lista_precio=listaPrecio):
+            contexto = None
+            if claves:
+                contexto = await run_blocking(lambda: {clave: search_by_key_tool(clave) for clave in claves})
+            async for chunk in self.tool_agent.run(query, session_id, lista_precio=listaPrecio, context=contexto):
                 yield chunk
         elif label == "irrelevante":
             answer = self.moderator.polite_answer()
-            self.tool_agent.add_irrelevant_message(session_id=session_id, question=query, full_answer=answer)
+            await run_blocking(self.tool_agent.add_irrelevant_message, session_id=session_id, question=query, full_answer=answer)
             yield answer
         elif label == "inapropiado":
-            session = self.tool_agent.sessions.find_one({"session_id": session_id}) or {}
+            session = await run_blocking(self.tool_agent.sessions.find_one, {"session_id": session_id}) or {}
             msg, tries, banned_until = self.moderator.evaluate_inappropriate_behavior(session, query)
 
-            self.moderator.update_inappropriate_session(session_id, tries, banned_until)
+            await run_blocking(self.moderator.update_inappropriate_session, session_id, tries, banned_until)
             yield msg
         else:
             yield "Lo siento, no entendí tu mensaje. ¿Podrías reformularlo?"
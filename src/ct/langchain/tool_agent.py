@@ -1,4 +1,5 @@
 import re
+import json
 import yaml
 import time
 from datetime import datetime, timezone
@@ -21,15 +22,16 @@ from langchain_community.cache import InMemoryCache, SQLiteCache, GPTCache, Redi
 from langchain.agents import create_openai_functions_agent, AgentExecutor, create_tool_calling_agent
 
 from ct.tools.ct_info import who_are_we
-from ct.tools.status import status_tool, StatusInput
-from ct.tools.support import get_support_info, SupportInput
-from ct.tools.inventory import inventory_tool, InventoryInput 
-from ct.tools.moneda_api import dolar_convertion_tool, DolarInput
-from ct.tools.sales_rules_tool import sales_rules_tool, SalesInput
+from ct.tools.status import status_tool, astatus_tool, StatusInput
+from ct.tools.support import get_support_info, aget_support_info, SupportInput
+from ct.tools.inventory import inventory_tool, ainventory_tool, InventoryInput, inventory_batch_tool, ainventory_batch_tool, InventoryBatchInput
+from ct.tools.moneda_api import dolar_convertion_tool, adolar_convertion_tool, DolarInput
+from ct.tools.sales_rules_tool import sales_rules_tool, asales_rules_tool, SalesInput
 from ct.tools.sucursales import get_sucursales_info, SucursalesInput
-from ct.tools.search_information import search_information_tool, search_by_key_tool, ClaveInput
+from ct.tools.search_information import search_information_tool, asearch_information_tool, search_by_key_tool, asearch_by_key_tool, ClaveInput
 
 from ct.settings.config import DATA_DIR
+from ct.settings.executor import run_blocking
 from ct.settings.clients import openai_api_key
 from ct.settings.tokens import TokenCostProcess, CostCalcAsyncHandler
 from ct.settings.clients import mongo_uri, mongo_collection_sessions, mongo_collection_message_backup
@@ -73,40 +75,54 @@ class ToolAgent:
             Tool(
                 name='search_information_tool',
                 func=search_information_tool.invoke,
+                coroutine=asearch_information_tool,
                 description="Busca productos, o información de productos mencionados, una búsqueda más general de lo que se puede encontrar en la empresa"
             ),
             StructuredTool.from_function(
                 func=inventory_tool,
+                coroutine=ainventory_tool,
                 name='inventory_tool',
                 description="Esta herramienta sirve como referencia y devuelve precios, moneda y existencias de un producto por su clave y listaPrecio",
                 args_schema=InventoryInput 
             ),
+            StructuredTool.from_function(
+                func=inventory_batch_tool,
+                coroutine=ainventory_batch_tool,
+                name='inventory_batch_tool',
+                description="Devuelve precios, moneda, existencias y si está en promoción de VARIAS claves en una sola llamada. Úsala en lugar de llamar inventory_tool por cada resultado",
+                args_schema=InventoryBatchInput
+            ),
             StructuredTool.from_function(
                 func=sales_rules_tool,
+                coroutine=asales_rules_tool,
                 name='sales_rules_tool',
                 description="Aplica reglas de promoción, devuelve el precio final y mensaje para mostrar al usuario",
                 args_schema=SalesInput
         ),
             StructuredTool.from_function(
                 func=dolar_convertion_tool,
+                coroutine=adolar_convertion_tool,
                 name='dolar_convertion_tool',
                 description="Solo usa la tool para convertir el precio de un producto de USD a MXN y hacer cuentas",
                 args_schema=DolarInput
         ),
             StructuredTool.from_function(
                 func=status_tool,
+                coroutine=astatus_tool,
                 name='status_tool',
                 description="Cuando pregunten por el estatus de algún pedido hecho, pide la factura y busca dicho estatus y no ofrezcas más detalles, solo los regresados por la tool",
                 args_schema=StatusInput
         ),
             StructuredTool.from_function(
                 func=search_by_key_tool,
+                coroutine=asearch_by_key_tool,
                 name="search_by_key_tool",
                 description="Busca en el docstore un producto o promoción EXACTA usando su clave CT, una sola clave en mayusculas. Búsqueda más específica",
                 args_schema=ClaveInput
         ),
             StructuredTool.from_function(
                 func=get_support_info,
+                coroutine=aget_support_info,
                 name="get_support_info",
                 description="Cuando necesites saber sobre cómo hacer compras en líneas, compras y envíos de ESD, políticas, garantías, devoluciones, términos y condiciones",
                 args_schema=SupportInput
@@ -165,8 +181,9 @@ class ToolAgent:
             return_intermediate_steps=False
         )
 
-    async def run(self, query: str, session_id: str, lista_precio: int):
-        full_history = self.get_session_history(session_id)
+    async def run(self, query: str, session_id: str, lista_precio: int, context: dict = None):
+        # pymongo es síncrono: las lecturas y escrituras de sesión van al pool de hilos
+        full_history = await run_blocking(self.get_session_history, session_id)
         chat_history = trim_messages(
             full_history,
             token_counter=lambda messages: sum(len(m.content.split()) for m in messages),
@@ -187,8 +204,17 @@ class ToolAgent:
         if self.executor is None:
             self.build_executor()
 
+        # Resultados de búsqueda por clave ya resueltos por el pre-ruteo
+        agent_input = query
+        if context:
+            agent_input = (
+                f"{query}\n\n"
+                "Resultado de search_by_key_tool (ya consultado, no repitas la búsqueda):\n"
+                f"{json.dumps(context, ensure_ascii=False)}"
+            )
+
         inputs = {
-            "input": query,
+            "input": agent_input,
             "chat_history": chat_history,
             "listaPrecio": lista_precio,
             "session_id" : session_id
@@ -207,12 +233,15 @@ class ToolAgent:
 
             if full_answer:
                 try:
-                    self.add_message(session_id, "human", query)
-                    self.add_message(session_id, "assistant", full_answer)
-                    self.add_message_backup(session_id, query, full_answer, metadata)
+                    await run_blocking(self.save_exchange, session_id, query, full_answer, metadata)
                 except Exception:
                     pass
 
+    def save_exchange(self, session_id: str, query: str, full_answer: str, metadata: dict):
+        self.add_message(session_id, "human", query)
+        self.add_message(session_id, "assistant", full_answer)
+        self.add_message_backup(session_id, query, full_answer, metadata)
+
     def get_session_history(self, session_id: str) -> list[BaseMessage]: 
         messages_data = []
         try:
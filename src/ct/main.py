@@ -1,4 +1,5 @@
-from fastapi import FastAPI
+import hmac
+from fastapi import FastAPI, Depends, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from ct.chat import (
     QueryRequest, 
@@ -6,7 +7,14 @@ from ct.chat import (
     async_chat_endpoint, 
     delete_chat_history_endpoint
     )
-from ct.tools.search_information import reload_vector_store
+from ct.tools.search_information import reload_vector_store, query_embeddings
+from ct.settings.database import mysql_pool
+from ct.settings.tool_cache import tool_cache_metrics
+from ct.tools.promotion_rules import promotion_rules, mark_promotions_changed
+from ct.tools.moneda_api import exchange_rate
+from ct.tools.status import pedidos_indexes
+from ct.settings.executor import blocking_executor, run_blocking
+from ct.settings.clients import internal_token
 
 app = FastAPI()
 
@@ -18,6 +26,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def require_internal(request: Request, x_internal_token: str | None = Header(default=None)):
+    """
+    Con INTERNAL_TOKEN configurado se exige en el header X-Internal-Token; sin él
+    solo se aceptan peticiones desde la misma máquina.
+    """
+    if internal_token:
+        if not x_internal_token or not hmac.compare_digest(x_internal_token, internal_token):
+            raise HTTPException(status_code=403, detail="No autorizado")
+    elif request.client is None or request.client.host not in ("127.0.0.1", "::1"):
+        raise HTTPException(status_code=403, detail="No autorizado")
+
 @app.get("/history/{user_id}")
 def handle_history(user_id: str):
     return get_chat_history(user_id)
@@ -32,11 +51,38 @@ async def handle_delete_history(user_id: str):
 
 @app.post("/internal/reload_vectorstores")
 async def reload_vectors():
+    resultado = {}
+    # Ambas recargas bloquean (FAISS y MySQL): corren en el pool de hilos para
+    # no detener los chats en curso de este worker
+    try:
+        await run_blocking(reload_vector_store)
+        resultado["vector_store"] = {"status": "ok", "message": "Vector store recargado."}
+    except Exception as e:
+        resultado["vector_store"] = {"status": "error", "message": str(e)}
+
+    # El ETL llama a este endpoint al publicar ofertas nuevas. La marca avisa a
+    # los demás workers; este recarga de inmediato.
     try:
-        reload_vector_store()
-        return {"status": "ok", "message": "Vector store recargado."}
+        mark_promotions_changed()
+        combinaciones = await run_blocking(promotion_rules.reload)
+        resultado["promotions"] = {"status": "ok", "message": f"Promociones recargadas ({combinaciones} combinaciones)."}
     except Exception as e:
-        return {"status": "error", "message": str(e)}
+        resultado["promotions"] = {"status": "error", "message": str(e)}
+
+    status = "ok" if all(r["status"] == "ok" for r in resultado.values()) else "error"
+    return {"status": status, **resultado}
+
+@app.get("/internal/metrics", dependencies=[Depends(require_internal)])
+def handle_metrics():
+    return {
+        "mysql_pool": mysql_pool.metrics(),
+        "query_embeddings": query_embeddings.cache.metrics(),
+        "tool_cache": tool_cache_metrics(),
+        "promotion_rules": promotion_rules.metrics(),
+        "exchange_rate": exchange_rate.metrics(),
+        "mongo_indexes": {"pedidos": pedidos_indexes},
+        "blocking_executor": blocking_executor.metrics()
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -2,6 +2,7 @@ import redis
 from typing import Optional
 from langchain_openai import ChatOpenAI
 from ct.settings.clients import openai_api_key
+from ct.settings.executor import run_blocking
 from datetime import datetime, timedelta, timezone
 
 class QueryModerator:
@@ -17,6 +18,19 @@ class QueryModerator:
     def classify_query(self, query: str, session_id: str) -> str:
         history = self._get_formatted_history(session_id)
 
+        response = self.llm.invoke(self._classification_messages(query, history))
+
+        return response.content.strip().lower()
+
+    async def aclassify_query(self, query: str, session_id: str) -> str:
+        """Igual que `classify_query`, sin bloquear el event loop: el LLM usa el cliente async."""
+        history = await run_blocking(self._get_formatted_history, session_id)
+
+        response = await self.llm.ainvoke(self._classification_messages(query, history))
+
+        return response.content.strip().lower()
+
+    def _classification_messages(self, query: str, history: str) -> list[dict]:
         full_prompt = (
             "HISTORIAL DE LA CONVERSACIÓN:\n"
             f"{history}\n"
@@ -24,12 +38,10 @@ class QueryModerator:
             f"{query}"
         )
 
-        response = self.llm.invoke([
+        return [
             {"role": "system", "content": self._classification_prompt()},
             {"role": "user", "content": full_prompt},
-        ])
-
-        return response.content.strip().lower()
+        ]
 
     def _classification_prompt(self) -> str:
         return """
@@ -50,3 +50,5 @@ openai = openai_api.OpenAI(api_key=openai_api_key)
 
 podman_redis_url: str = os.getenv("PODMAN_REDIS_URL")
 reload_vectors_post : str = os.getenv("reload_vectors_post")
+# Token para los endpoints internos (/internal/metrics); sin él solo se aceptan peticiones locales
+internal_token: str = os.getenv("INTERNAL_TOKEN")
@@ -1,4 +1,5 @@
 # config.py
+import os
 from pathlib import Path
 
 # Detecta la raíz del proyecto automáticamente (por ejemplo buscando "pyproject.toml")
@@ -21,6 +22,48 @@ SUPPORT_INFO_VECTOR_PATH = VECTORS_DIR / "guarantees_vector_store"
 
 ID_SUCURSAL = BASE_DIR / "datos" / "idSucursal.json"
 BASE_KNOWLEDGE = BASE_DIR / "datos" / "base_de_conocimientos"
+SPECS_CHECKPOINT = BASE_DIR / "datos" / "fichas_checkpoint.jsonl"
+SPECS_FAILURES = BASE_DIR / "datos" / "fichas_fallidas.json"
+EMBEDDINGS_CACHE_PATH = BASE_DIR / "datos" / "embeddings_cache.sqlite"
+
+# Presupuesto para generar embeddings en paralelo durante el ETL
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "500"))
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "4"))
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "3000"))
+EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "1000000"))
+
+# Tipo de índice del vector store publicado: "flat" (búsqueda exacta), "ivf",
+# "ivfpq" (IVF con compresión PQ) o "hnsw"
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")
+VECTOR_INDEX_NLIST = int(os.getenv("VECTOR_INDEX_NLIST", "0"))  # 0 = 4·√n
+VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "16"))
+VECTOR_INDEX_PQ_M = int(os.getenv("VECTOR_INDEX_PQ_M", "64"))
+VECTOR_INDEX_HNSW_M = int(os.getenv("VECTOR_INDEX_HNSW_M", "32"))
+VECTOR_INDEX_EF_SEARCH = int(os.getenv("VECTOR_INDEX_EF_SEARCH", "128"))
+
+# Documentos que devuelve cada colección en la búsqueda MMR
+RETRIEVER_K = {"productos": 8, "promociones": 10}
+RETRIEVER_LAMBDA_MULT = 0.85
+
+# Caché de embeddings de las consultas de búsqueda (LRU local + Redis)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "5000"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "86400"))
+
+# Caché de inventario y precios de las herramientas (segundos)
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "30"))
+TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "20000"))
+
+# Antigüedad máxima de las reglas de promociones en memoria antes de recargarlas
+PROMOTIONS_REFRESH_SECONDS = float(os.getenv("PROMOTIONS_REFRESH_SECONDS", "600"))
+
+# Cada cuántos segundos se relee el tipo de cambio de monedas_api
+EXCHANGE_RATE_REFRESH_SECONDS = float(os.getenv("EXCHANGE_RATE_REFRESH_SECONDS", "300"))
+
+# Hilos para ejecutar llamadas bloqueantes (MySQL, Mongo, FAISS) sin frenar el event loop
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "16"))
+
+# Cada cuántos segundos un worker revisa si se publicó otra versión del vector store
+VECTOR_STORE_CHECK_SECONDS = float(os.getenv("VECTOR_STORE_CHECK_SECONDS", "5"))
 
 # 🔥 Crear directorios automáticamente
 for path in [DATA_DIR, VECTORS_DIR, PRODUCTS_VECTOR_PATH, SALES_VECTOR_PATH, SALES_PRODUCTS_VECTOR_PATH, BASE_KNOWLEDGE, SUPPORT_INFO_VECTOR_PATH]:
@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+from collections import deque
+from mysql.connector import pooling, errors
+from ct.settings.clients import ip, port, user, pwd, database
+
+# Parámetros del pool (configurables por variables de entorno)
+pool_size: int = min(int(os.getenv("MYSQL_POOL_SIZE", "8")), pooling.CNX_POOL_MAXSIZE)
+pool_timeout: float = float(os.getenv("MYSQL_POOL_TIMEOUT", "10"))
+pool_health_check: float = float(os.getenv("MYSQL_POOL_HEALTH_CHECK", "30"))
+
+
+class MySQLPool:
+    """
+    Pool de conexiones MySQL compartido por todo el proceso.
+
+    - Se crea de forma perezosa y se vuelve a crear si el proceso cambió
+      (los workers de gunicorn no deben heredar sockets del proceso padre).
+    - Si el pool está agotado, espera hasta `timeout` segundos a que se
+      libere una conexión en lugar de fallar de inmediato.
+    - Las conexiones que llevan más de `health_check` segundos sin usarse se
+      verifican con un ping y se reconectan si el servidor las cerró.
+    - Registra cuánto tiempo esperan las peticiones por una conexión.
+    """
+
+    def __init__(self, size: int = pool_size, timeout: float = pool_timeout, health_check: float = pool_health_check):
+        self.size = size
+        self.timeout = timeout
+        self.health_check = health_check
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._metrics_lock = threading.Lock()
+        self._waits = deque(maxlen=1000)
+        self._metrics = {"checkouts": 0, "reconnects": 0, "timeouts": 0, "wait_total": 0.0, "wait_max": 0.0}
+
+    def _get_pool(self) -> pooling.MySQLConnectionPool:
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    self._pool = pooling.MySQLConnectionPool(
+                        pool_name=f"ct_pool_{os.getpid()}",
+                        pool_size=self.size,
+                        # Limpia transacciones abiertas y variables de sesión al regresar cada conexión
+                        pool_reset_session=True,
+                        host=ip,
+                        port=port,
+                        user=user,
+                        password=pwd,
+                        database=database,
+                        read_timeout=60,
+                        write_timeout=15
+                    )
+                    self._pid = os.getpid()
+                    self._last_used.clear()
+        return self._pool
+
+    def _check_health(self, cnx) -> None:
+        key = id(cnx._cnx)
+        last_used = self._last_used.get(key)
+        if last_used is not None and time.monotonic() - last_used < self.health_check:
+            return
+        try:
+            cnx.ping(reconnect=False)
+        except errors.Error:
+            cnx.reconnect(attempts=2, delay=0)
+            with self._metrics_lock:
+                self._metrics["reconnects"] += 1
+
+    def get_connection(self):
+        """
+        Devuelve una conexión del pool. Al llamar `close()` sobre ella regresa al
+        pool en lugar de cerrarse, así que el patrón try/finally existente sigue
+        funcionando sin cambios.
+        """
+        pool = self._get_pool()
+        inicio = time.perf_counter()
+        while True:
+            try:
+                cnx = pool.get_connection()
+                break
+            except errors.PoolError:
+                if time.perf_counter() - inicio >= self.timeout:
+                    with self._metrics_lock:
+                        self._metrics["timeouts"] += 1
+                    raise
+                time.sleep(0.005)
+
+        espera = time.perf_counter() - inicio
+        with self._metrics_lock:
+            self._waits.append(espera)
+            self._metrics["checkouts"] += 1
+            self._metrics["wait_total"] += espera
+            self._metrics["wait_max"] = max(self._metrics["wait_max"], espera)
+
+        try:
+            self._check_health(cnx)
+        except errors.Error:
+            cnx.close()
+            raise
+        self._last_used[id(cnx._cnx)] = time.monotonic()
+        return cnx
+
+    def metrics(self) -> dict:
+        """Resumen de uso del pool y de los tiempos de espera por conexión."""
+        with self._metrics_lock:
+            waits = sorted(self._waits)
+            metrics = dict(self._metrics)
+        checkouts = metrics["checkouts"]
+        return {
+            "pool_size": self.size,
+            "checkouts": checkouts,
+            "reconnects": metrics["reconnects"],
+            "timeouts": metrics["timeouts"],
+            "wait_avg_ms": (metrics["wait_total"] / checkouts * 1000) if checkouts else 0.0,
+            "wait_p95_ms": (waits[int(len(waits) * 0.95) - 1 if len(waits) > 1 else 0] * 1000) if waits else 0.0,
+            "wait_max_ms": metrics["wait_max"] * 1000,
+        }
+
+
+mysql_pool = MySQLPool()
+
+
+def get_connection():
+    """Atajo para obtener una conexión del pool compartido del proceso."""
+    return mysql_pool.get_connection()
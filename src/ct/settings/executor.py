@@ -0,0 +1,61 @@
+import os
+import asyncio
+import threading
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from ct.settings.config import BLOCKING_WORKERS
+
+
+class BlockingExecutor:
+    """
+    Pool acotado de hilos para las llamadas síncronas que se hacen desde el
+    event loop (drivers de MySQL y Mongo, búsquedas en FAISS).
+
+    - Se crea de forma perezosa y se vuelve a crear si el proceso cambió
+      (los workers de uvicorn/gunicorn no heredan hilos del proceso padre).
+    - El tamaño está acotado para no abrir más conexiones simultáneas de las
+      que aguantan los pools de las bases de datos; lo que exceda espera en cola.
+    - Se copia el contexto (contextvars) para que los callbacks de LangChain
+      sigan funcionando dentro del hilo.
+    """
+
+    def __init__(self, max_workers: int = BLOCKING_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._metrics = {"calls": 0, "max_in_flight": 0}
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="blocking")
+                    self._pid = os.getpid()
+        return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = partial(contextvars.copy_context().run, func, *args, **kwargs)
+        with self._lock:
+            self._in_flight += 1
+            self._metrics["calls"] += 1
+            self._metrics["max_in_flight"] = max(self._metrics["max_in_flight"], self._in_flight)
+        try:
+            return await loop.run_in_executor(self._get_executor(), call)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def metrics(self) -> dict:
+        return {"max_workers": self.max_workers, "in_flight": self._in_flight, **self._metrics}
+
+
+blocking_executor = BlockingExecutor()
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Ejecuta `func(*args, **kwargs)` en el pool de hilos y espera su resultado sin bloquear el event loop."""
+    return await blocking_executor.run(func, *args, **kwargs)
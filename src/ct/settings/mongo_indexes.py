@@ -0,0 +1,49 @@
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+
+# Índices de los que dependen las consultas del proyecto, por colección.
+# Orden de los campos: primero los de igualdad y al final el del sort.
+PEDIDOS_INDEXES = {
+    "folio_cliente_fecha": [
+        ("pedido.encabezado.folio", ASCENDING),
+        ("pedido.encabezado.cliente", ASCENDING),
+        ("pedido.fecha", ASCENDING),
+    ],
+    "folio_factura_cliente_fecha": [
+        ("estatus.Facturado.folioFactura", ASCENDING),
+        ("pedido.encabezado.cliente", ASCENDING),
+        ("pedido.fecha", ASCENDING),
+    ],
+}
+
+
+def ensure_indexes(collection, indexes: dict, create: bool = False) -> dict:
+    """
+    Verifica que `collection` tenga cada índice de `indexes` (por llaves, sin
+    importar el nombre con el que se creó). Por omisión solo se reportan los
+    que falten; con `create=True` se crean (lo hace `ct.ETL.create_mongo_indexes`).
+
+    Devuelve {nombre: "ok" | "creado" | "faltante" | "error: ..."}.
+    """
+    estado = {}
+    try:
+        existentes = {tuple(tuple(par) for par in info["key"]) for info in collection.index_information().values()}
+    except PyMongoError as e:
+        print(f"⚠️ No se pudieron leer los índices de {collection.name}: {e}")
+        return {nombre: f"error: {e}" for nombre in indexes}
+
+    for nombre, llaves in indexes.items():
+        if tuple(llaves) in existentes:
+            estado[nombre] = "ok"
+        elif not create:
+            estado[nombre] = "faltante"
+            print(f"⚠️ Falta el índice {nombre} en {collection.name}: {llaves}")
+        else:
+            try:
+                collection.create_index(llaves, name=nombre)
+                estado[nombre] = "creado"
+                print(f"✅ Índice {nombre} creado en {collection.name}.")
+            except PyMongoError as e:
+                estado[nombre] = f"error: {e}"
+                print(f"⚠️ No se pudo crear el índice {nombre} en {collection.name}: {e}")
+    return estado
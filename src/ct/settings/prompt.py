@@ -16,7 +16,7 @@ prompt_dict = {
         "tipos_consulta": {
             "especificas": (
                 "Usa `search_information_tool` para buscar el producto solicitado. "
-                "Para cada resultado, obtén información adicional con `inventory_tool`. "
+                "Obtén precio y existencias de todos los resultados con una sola llamada a `inventory_batch_tool`. "
                 "SIEMPRE que el producto esté en promoción, usa `sales_rules_tool`. "
                 "Escoge calidad-precio y lo que mejor se adapte a las necesidades del usuario."
             ),
@@ -77,6 +77,11 @@ prompt_dict = {
             "objetivo":"Conocer el precio, moneda y existencias de un producto por clave y listaPrecio",
             "uso": "inventory_tool(clave='CLAVE_DEL_PRODUCTO', listaPrecio={listaPrecio})"
         },
+        "inventory_batch_tool": {
+            "objetivo":"Conocer precio, moneda, existencias y promoción de varios productos en una sola consulta",
+            "uso": "inventory_batch_tool(claves=['CLAVE_1', 'CLAVE_2', ...], listaPrecio={listaPrecio})",
+            "nota": "Cuando tengas más de un producto, usa esta herramienta en lugar de llamar `inventory_tool` por cada uno"
+        },
         "sales_rules_tool": {
             "objetivo":"Cada producto en promoción debe seguir ciertas reglas y/o verificar si está en promoción",
             "uso": "sales_rules_tool(clave='CLAVE_DEL_PRODUCTO', listaPrecio={listaPrecio}, session_id={session_id})"
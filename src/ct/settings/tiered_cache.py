@@ -0,0 +1,174 @@
+import json
+import time
+import threading
+import redis
+from cachetools import TTLCache
+from ct.settings.clients import podman_redis_url
+
+
+class TieredCache:
+    """
+    Caché de dos niveles:
+    - L1 en el proceso: LRU con TTL (cachetools), sin costo de red.
+    - L2 opcional en Redis, compartido por todos los workers.
+
+    Una lectura que encuentra el valor en Redis lo copia al L1. Si Redis no
+    está configurado o falla, el caché sigue funcionando solo con el L1 y
+    vuelve a intentar Redis después de `retry_seconds`.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        maxsize: int = 1024,
+        ttl: float = 3600,
+        redis_url: str | None = podman_redis_url,
+        dumps=json.dumps,
+        loads=json.loads,
+        retry_seconds: float = 30
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.dumps = dumps
+        self.loads = loads
+        self.retry_seconds = retry_seconds
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5) if redis_url else None
+        self._redis_down_until = 0.0
+        self._metrics = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "redis_errors": 0}
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _redis_available(self) -> bool:
+        return self._redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, e: Exception) -> None:
+        with self._lock:
+            self._metrics["redis_errors"] += 1
+            self._redis_down_until = time.monotonic() + self.retry_seconds
+        print(f"⚠️ Redis no disponible para el caché {self.namespace} ({e}); se usa solo el caché local.")
+
+    def _lookup(self, key: str):
+        """Busca en L1 y luego en Redis. Devuelve (valor, nivel) o (None, None)."""
+        with self._lock:
+            if key in self._local:
+                return self._local[key], "l1_hits"
+
+        if self._redis_available():
+            try:
+                raw = self._redis.get(self._redis_key(key))
+            except redis.RedisError as e:
+                self._redis_failed(e)
+                raw = None
+            if raw is not None:
+                value = self.loads(raw)
+                with self._lock:
+                    self._local[key] = value
+                return value, "l2_hits"
+        return None, None
+
+    def _count(self, metric: str) -> None:
+        with self._lock:
+            self._metrics[metric] += 1
+
+    def get(self, key: str):
+        value, nivel = self._lookup(key)
+        self._count(nivel or "misses")
+        return value
+
+    def get_many(self, keys: list[str]) -> dict:
+        """Busca varias llaves: las que faltan en L1 se piden a Redis en una sola llamada."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._local:
+                    found[key] = self._local[key]
+            self._metrics["l1_hits"] += len(found)
+
+        faltantes = [key for key in keys if key not in found]
+        if faltantes and self._redis_available():
+            try:
+                raws = self._redis.mget([self._redis_key(key) for key in faltantes])
+            except redis.RedisError as e:
+                self._redis_failed(e)
+                raws = [None] * len(faltantes)
+            with self._lock:
+                for key, raw in zip(faltantes, raws):
+                    if raw is not None:
+                        found[key] = self._local[key] = self.loads(raw)
+                        self._metrics["l2_hits"] += 1
+
+        with self._lock:
+            self._metrics["misses"] += len(keys) - len(found)
+        return found
+
+    def set(self, key: str, value) -> None:
+        with self._lock:
+            self._local[key] = value
+        if self._redis_available():
+            try:
+                self._redis.set(self._redis_key(key), self.dumps(value), ex=int(self.ttl))
+            except redis.RedisError as e:
+                self._redis_failed(e)
+
+    def get_or_set(self, key: str, factory):
+        """
+        Devuelve el valor de `key` o lo calcula con `factory()`. Si varios hilos
+        piden la misma llave a la vez, solo uno la calcula y los demás esperan
+        su resultado.
+        """
+        value, nivel = self._lookup(key)
+        if value is not None:
+            self._count(nivel)
+            return value
+
+        with self._lock:
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+        with key_lock:
+            try:
+                # Otro hilo pudo haberlo calculado mientras se esperaba el candado
+                with self._lock:
+                    value = self._local.get(key)
+                if value is not None:
+                    self._count("l1_hits")
+                    return value
+                self._count("misses")
+                value = factory()
+                self.set(key, value)
+                return value
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+    def invalidate(self, prefix: str = "") -> None:
+        """
+        Elimina las llaves que empiezan con `prefix` (todas si está vacío) del L1
+        de este proceso y de Redis. En los demás workers el L1 expira solo en
+        `ttl` segundos como máximo.
+        """
+        with self._lock:
+            for key in [key for key in self._local if key.startswith(prefix)]:
+                self._local.pop(key, None)
+        if self._redis_available():
+            try:
+                lote = []
+                for redis_key in self._redis.scan_iter(match=f"{self._redis_key(prefix)}*", count=500):
+                    lote.append(redis_key)
+                    if len(lote) == 500:
+                        self._redis.delete(*lote)
+                        lote = []
+                if lote:
+                    self._redis.delete(*lote)
+            except redis.RedisError as e:
+                self._redis_failed(e)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["l1_size"] = len(self._local)
+        total = metrics["l1_hits"] + metrics["l2_hits"] + metrics["misses"]
+        metrics["hit_rate"] = (metrics["l1_hits"] + metrics["l2_hits"]) / total if total else 0.0
+        return metrics
@@ -0,0 +1,30 @@
+from ct.settings.tiered_cache import TieredCache
+from ct.settings.config import TOOL_CACHE_TTL, TOOL_CACHE_SIZE
+
+# Respuestas de inventory_tool por clave y listaPrecio
+inventory_cache = TieredCache("inventory", maxsize=TOOL_CACHE_SIZE, ttl=TOOL_CACHE_TTL)
+# Respuestas de sales_rules_tool por clave, listaPrecio y sucursal
+sales_cache = TieredCache("sales_rules", maxsize=TOOL_CACHE_SIZE, ttl=TOOL_CACHE_TTL)
+
+
+def inventory_key(clave: str, lista_precio) -> str:
+    return f"{clave.upper()}:{lista_precio}"
+
+
+def sales_key(clave: str, lista_precio, id_sucursal) -> str:
+    return f"{clave.upper()}:{lista_precio}:{id_sucursal}"
+
+
+def invalidate_tool_caches(claves: list[str] = None) -> None:
+    """
+    Gancho para el ETL: descarta el inventario y las promociones en caché de
+    las claves indicadas, o de todas si no se indican.
+    """
+    prefijos = [f"{clave.upper()}:" for clave in claves] if claves is not None else [""]
+    for cache in (inventory_cache, sales_cache):
+        for prefijo in prefijos:
+            cache.invalidate(prefijo)
+
+
+def tool_cache_metrics() -> dict:
+    return {"inventory": inventory_cache.metrics(), "sales_rules": sales_cache.metrics()}
@@ -1,5 +1,5 @@
 
-from ct.settings.clients import ip, port, user, pwd, database
+from ct.settings.database import get_connection
 import mysql.connector
 import json
 
@@ -23,15 +23,7 @@ def fetch_data_as_json(query):
     cursor = None
     try:
         # 1. Establece la conexión a la base de datos
-        cnx = mysql.connector.connect(
-            host=ip,
-            port=port,
-            user=user,
-            password=pwd,
-            database=database,
-            read_timeout=60,
-            write_timeout=15
-        )
+        cnx = get_connection()
         cursor = cnx.cursor()
 
         # 2. Ejecuta la consulta
@@ -60,5 +52,5 @@ def fetch_data_as_json(query):
         # Cierra el cursor y la conexión de forma segura
         if cursor:
             cursor.close()
-        if cnx and cnx.is_connected():
+        if cnx:
             cnx.close()
\ No newline at end of file
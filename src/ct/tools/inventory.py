@@ -1,6 +1,8 @@
 import mysql.connector
 from pydantic import BaseModel, Field
-from ct.settings.clients import ip, port, user, pwd, database
+from ct.settings.database import get_connection
+from ct.settings.tool_cache import inventory_cache, inventory_key
+from ct.settings.executor import run_blocking
 import pymysql
 pymysql.install_as_MySQLdb()
 
@@ -10,6 +12,10 @@ class InventoryInput(BaseModel):
     clave: str = Field(description="Clave del producto")
     listaPrecio: int = Field(description="Lista de precio al que pertenece el usuario")
 
+class InventoryBatchInput(BaseModel):
+    claves: list[str] = Field(description="Claves de todos los productos a consultar")
+    listaPrecio: int = Field(description="Lista de precio al que pertenece el usuario")
+
 query = """
 SELECT pro.clave, 
        SUM(e.cantidad) AS existencias, 
@@ -26,52 +32,70 @@ WHERE pro.clave = %s
 GROUP BY pro.idProductos, pre.precio, pre.idMoneda;
     """
 
+def batch_query(total_claves: int) -> str:
+    """Misma consulta que `query` para varias claves a la vez."""
+    placeholders = ", ".join(["%s"] * total_claves)
+    return query.replace("WHERE pro.clave = %s", f"WHERE pro.clave IN ({placeholders})")
+
+# Valor que se guarda en caché cuando la clave no existe; cada herramienta arma su propio mensaje
+NOT_FOUND = ""
+
+def _not_found(clave: str = None) -> str:
+    mensaje = "No se encontró el producto o no tiene existencias."
+    return f"{clave}: {mensaje}" if clave else mensaje
+
+def _format_inventory(result) -> str:
+    # result indexes según tu SELECT:
+    # 0 = clave
+    # 1 = existencias
+    # 2 = precio
+    # 3 = idMoneda
+    # 4 = modelo
+    # 5 = activo
+    # 6 = en_promocion
+    clave_prod = result[0]
+    existencias = result[1]
+    precio = result[2]
+    id_moneda = result[3]
+    modelo = result[4]
+    activo = result[5]
+    en_promocion = result[6]
+
+    moneda = "MXN" if id_moneda == 1 else "USD"
+
+    # lógica ESD
+    if modelo == "ESD" and activo == 1:
+        disponibilidad = "sí hay disponibles"
+    else:
+        if existencias == 0:
+            disponibilidad = f"disponibilidad sobre pedido"
+        else:
+            disponibilidad = f"{existencias} unidades disponibles"
+
+    return (
+        f"{clave_prod}: precio original: ${precio} {moneda}, "
+        f"{disponibilidad}, ¿en promoción?: {en_promocion}"
+    )
+
 # 2. La función ahora es una función Python normal, sin el decorador @tool
 def inventory_tool(clave: str, listaPrecio: int) -> str:
     lista_precio = listaPrecio
+    key = inventory_key(clave, lista_precio)
+    cached = inventory_cache.get(key)
+    if cached is not None:
+        return cached or _not_found()
+
     cnx = None
     cursor = None
     try:
-        cnx = mysql.connector.connect(
-            host=ip, port=port, user=user, password=pwd, database=database,
-            read_timeout=60, write_timeout=15
-        )
+        cnx = get_connection()
         cursor = cnx.cursor()
         cursor.execute(query, (lista_precio, clave))
         result = cursor.fetchone()
-        if result:
-            # result indexes según tu SELECT:
-            # 0 = clave
-            # 1 = existencias
-            # 2 = precio
-            # 3 = idMoneda
-            # 4 = modelo
-            # 5 = activo
-            # 6 = en_promocion
-            clave_prod = result[0]
-            existencias = result[1]
-            precio = result[2]
-            id_moneda = result[3]
-            modelo = result[4]
-            activo = result[5]
-            en_promocion = result[6]
-
-            moneda = "MXN" if id_moneda == 1 else "USD"
-
-            # lógica ESD
-            if modelo == "ESD" and activo == 1:
-                disponibilidad = "sí hay disponibles"
-            else:
-                if existencias == 0:
-                    disponibilidad = f"disponibilidad sobre pedido"
-                else:
-                    disponibilidad = f"{existencias} unidades disponibles"
-
-            return (
-                f"{clave_prod}: precio original: ${precio} {moneda}, "
-                f"{disponibilidad}, ¿en promoción?: {en_promocion}"
-            )
-        return "No se encontró el producto o no tiene existencias."
+        # Solo se guardan respuestas de la base, nunca los mensajes de error
+        respuesta = _format_inventory(result) if result else NOT_FOUND
+        inventory_cache.set(key, respuesta)
+        return respuesta or _not_found()
     except mysql.connector.Error as err:
         return f"Error de base de datos: {err}"
     except Exception as e:
@@ -82,3 +106,53 @@ def inventory_tool(clave: str, listaPrecio: int) -> str:
         if cnx:
             cnx.close()
 
+def inventory_batch_tool(claves: list[str], listaPrecio: int) -> str:
+    """
+    Precio, moneda, existencias y promoción de varias claves con una sola
+    consulta. Devuelve una línea por clave, en el orden recibido.
+    """
+    claves = list(dict.fromkeys(clave.strip().upper() for clave in claves if clave and clave.strip()))
+    if not claves:
+        return "No se recibieron claves."
+
+    # Solo las claves que no están en caché llegan a MySQL
+    cached = inventory_cache.get_many([inventory_key(clave, listaPrecio) for clave in claves])
+    respuestas = {clave: cached[inventory_key(clave, listaPrecio)] for clave in claves if inventory_key(clave, listaPrecio) in cached}
+    faltantes = [clave for clave in claves if clave not in respuestas]
+    if not faltantes:
+        return "\n".join(respuestas[clave] or _not_found(clave) for clave in claves)
+
+    cnx = None
+    cursor = None
+    try:
+        cnx = get_connection()
+        cursor = cnx.cursor()
+        cursor.execute(batch_query(len(faltantes)), (listaPrecio, *faltantes))
+        encontrados = {}
+        for result in cursor.fetchall():
+            # Una clave puede traer varias filas si tiene varios precios: se queda la primera
+            encontrados.setdefault(str(result[0]).upper(), _format_inventory(result))
+        for clave in faltantes:
+            respuestas[clave] = encontrados.get(clave, NOT_FOUND)
+            inventory_cache.set(inventory_key(clave, listaPrecio), respuestas[clave])
+        return "\n".join(respuestas[clave] or _not_found(clave) for clave in claves)
+    except mysql.connector.Error as err:
+        return f"Error de base de datos: {err}"
+    except Exception as e:
+        return f"Ocurrió un error inesperado: {e}"
+    finally:
+        if cursor:
+            cursor.close()
+        if cnx:
+            cnx.close()
+
+async def ainventory_tool(clave: str, listaPrecio: int) -> str:
+    """Versión asíncrona para el agente: la consulta corre en el pool de hilos."""
+    return await run_blocking(inventory_tool, clave, listaPrecio)
+
+async def ainventory_batch_tool(claves: list[str], listaPrecio: int) -> str:
+    """
+    Versión asíncrona para el agente: la consulta usa una conexión del pool en
+    un hilo, así que no bloquea el event loop mientras MySQL responde.
+    """
+    return await run_blocking(inventory_batch_tool, claves, listaPrecio)
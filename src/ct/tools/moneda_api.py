@@ -1,6 +1,11 @@
+import os
+import time
+import threading
 import mysql.connector
 from pydantic import BaseModel, Field
-from ct.settings.clients import ip, port, user, pwd, database
+from ct.settings.database import get_connection
+from ct.settings.config import EXCHANGE_RATE_REFRESH_SECONDS
+from ct.settings.executor import run_blocking
 import pymysql
 pymysql.install_as_MySQLdb()
 
@@ -16,28 +21,107 @@ FROM monedas_api
 LIMIT 1
 """
 
+class ExchangeRateProvider:
+    """
+    Tipo de cambio USD → MXN en memoria, compartido por todas las conversiones.
+
+    Un hilo en segundo plano relee `monedas_api` cada `refresh_seconds`. El hilo
+    se arranca al primer uso en cada proceso (los workers de uvicorn hacen fork
+    y no heredan hilos). Si una lectura falla se conserva el último valor.
+    """
+
+    def __init__(self, refresh_seconds: float = EXCHANGE_RATE_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._rate = None
+        self._updated_at = None
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _read_rate(self):
+        cnx = None
+        cursor = None
+        try:
+            cnx = get_connection()
+            cursor = cnx.cursor()
+            cursor.execute(query)
+            result = cursor.fetchone()
+            return float(result[1]) if result else None
+        finally:
+            if cursor:
+                cursor.close()
+            if cnx:
+                cnx.close()
+
+    def refresh(self):
+        """Lee el tipo de cambio de la base y lo deja en memoria."""
+        rate = self._read_rate()
+        if rate is not None:
+            self._rate = rate
+            self._updated_at = time.monotonic()
+        return self._rate
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                # Se sigue usando el último tipo de cambio conocido
+                print(f"⚠️ No se pudo actualizar el tipo de cambio: {e}")
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._rate is None:
+                self.refresh()
+            threading.Thread(target=self._refresh_loop, daemon=True).start()
+            self._pid = os.getpid()
+
+    @property
+    def rate(self):
+        """Pesos por dólar, o None si todavía no se ha podido leer."""
+        self._ensure_started()
+        return self._rate
+
+    @property
+    def loaded(self) -> bool:
+        return self._pid == os.getpid() and self._rate is not None
+
+    @property
+    def age_seconds(self):
+        if self._updated_at is None:
+            return None
+        return time.monotonic() - self._updated_at
+
+    def convert(self, dolar: float):
+        rate = self.rate
+        return None if rate is None else dolar * rate
+
+    def metrics(self) -> dict:
+        age = self.age_seconds
+        return {
+            "rate": self._rate,
+            "age_seconds": None if age is None else round(age, 1),
+            "refresh_seconds": self.refresh_seconds,
+        }
+
+
+exchange_rate = ExchangeRateProvider()
+
 def dolar_convertion_tool(dolar: float) -> str:
-    cnx = None
-    cursor = None
     try:
-        cnx = mysql.connector.connect(
-            host=ip,
-            port=port,
-            user=user,
-            password=pwd,
-            database=database,
-            read_timeout=60,
-            write_timeout=15
-        )
-        cursor = cnx.cursor()
-        cursor.execute(query)
-        result = cursor.fetchone()
-        if result:
-            return f"El equivalente de {dolar} USD es {(dolar * result[1]):.3f} MXN"
+        pesos = exchange_rate.convert(dolar)
+        if pesos is None:
+            return "No se encontró el tipo de cambio."
+        return f"El equivalente de {dolar} USD es {pesos:.3f} MXN"
     except mysql.connector.Error as err:
         return f"Error de base de datos: {err}"
-    finally:
-        if cursor:
-            cursor.close()
-        if cnx:
-            cnx.close()
\ No newline at end of file
+
+async def adolar_convertion_tool(dolar: float) -> str:
+    # Normalmente responde desde memoria; solo la primera lectura del proceso va a MySQL
+    if exchange_rate.loaded:
+        return dolar_convertion_tool(dolar)
+    return await run_blocking(dolar_convertion_tool, dolar)
@@ -0,0 +1,178 @@
+import os
+import time
+import threading
+from datetime import date
+from collections import defaultdict
+from ct.settings.database import get_connection
+from ct.settings.config import DATA_DIR, PROMOTIONS_REFRESH_SECONDS, VECTOR_STORE_CHECK_SECONDS
+
+# Marca compartida por todos los workers: el ETL o el endpoint de recarga la
+# cambian y cada worker recarga su tabla al notar la diferencia
+PROMOTIONS_STAMP = DATA_DIR / "promotions.stamp"
+
+# Todas las promociones vigentes o por iniciar, para cada lista de precio.
+# Las columnas 3 en adelante son las mismas que devuelve `query_sales`.
+PROMOTIONS_QUERY = """
+SELECT
+    pros.producto                      AS clave,
+    pros.sucursal_promo,
+    pre.listaPrecio,
+    pre.precio 			       AS precio_regular,
+    pros.importe                       AS precio_oferta,
+    pros.porcentaje                    AS descuento,
+    pros.EnCompraDE,
+    pros.Unidades,
+    pros.limitadoA,
+    pros.ProductosGratis,
+    pros.fecha_inicio,
+    pros.fecha_fin,
+    pre.idMoneda                       AS moneda
+FROM promociones pros
+  INNER JOIN productos pro
+    ON pro.idProductos = pros.idProducto
+  INNER JOIN precio pre
+    ON pros.idProducto = pre.idProducto
+WHERE
+    pros.fecha_fin    >= CURRENT_DATE
+    AND pro.descripcion_corta_icecat != ''
+    AND pre.idMoneda IS NOT NULL
+ORDER BY
+    pros.fecha_inicio DESC;
+"""
+
+
+def _key(clave, lista_precio, id_sucursal) -> tuple[str, str, str]:
+    return str(clave).upper(), str(lista_precio), str(id_sucursal)
+
+
+def _read_stamp() -> str | None:
+    try:
+        return PROMOTIONS_STAMP.read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def mark_promotions_changed() -> None:
+    """
+    Avisa a todos los workers que las promociones cambiaron. Se escribe a un
+    temporal y se reemplaza de forma atómica, igual que el CURRENT del vector store.
+    """
+    tmp = PROMOTIONS_STAMP.with_name(f".{PROMOTIONS_STAMP.name}.{os.getpid()}.tmp")
+    tmp.write_text(str(time.time_ns()), encoding="utf-8")
+    os.replace(tmp, PROMOTIONS_STAMP)
+
+
+class PromotionRules:
+    """
+    Tabla en memoria de las promociones por (clave, listaPrecio, sucursal).
+
+    Se carga de forma perezosa en segundo plano con la primera consulta (hasta
+    entonces `ready()` es False y sales_rules_tool consulta MySQL), así que una
+    caída de la base no impide que arranque el servidor. Se vuelve a cargar cada
+    `refresh_seconds`, al cambiar el día o cuando cambia `PROMOTIONS_STAMP`
+    (se revisa cada `stamp_check_seconds`); mientras tanto se sigue usando la
+    tabla anterior. La vigencia se evalúa en cada consulta, así que una
+    promoción que inicia o termina hoy se respeta sin recargar.
+    """
+
+    def __init__(self, refresh_seconds: float = PROMOTIONS_REFRESH_SECONDS, stamp_check_seconds: float = VECTOR_STORE_CHECK_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.stamp_check_seconds = stamp_check_seconds
+        self._rules = None
+        self._loaded_at = 0.0
+        self._loaded_on = None
+        self._retry_at = 0.0
+        self._stamp = None
+        self._stamp_changed = False
+        self._stamp_checked_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = threading.Event()
+
+    def reload(self) -> int:
+        """Lee todas las promociones de MySQL y reemplaza la tabla. Devuelve cuántas cargó."""
+        with self._lock:
+            inicio = time.perf_counter()
+            stamp = _read_stamp()
+            rules = defaultdict(list)
+            cnx = None
+            cursor = None
+            try:
+                cnx = get_connection()
+                cursor = cnx.cursor()
+                cursor.execute(PROMOTIONS_QUERY)
+                for row in cursor.fetchall():
+                    rules[_key(row[0], row[2], row[1])].append(row[3:])
+            finally:
+                if cursor:
+                    cursor.close()
+                if cnx:
+                    cnx.close()
+            self._rules = dict(rules)
+            self._loaded_at = time.monotonic()
+            self._loaded_on = date.today()
+            self._stamp = stamp
+            self._stamp_changed = False
+        print(f"✅ Reglas de promociones cargadas en memoria ({len(self._rules)} combinaciones, {time.perf_counter() - inicio:.2f} s).")
+        return len(self._rules)
+
+    def _reload_in_background(self):
+        try:
+            self.reload()
+        except Exception as e:
+            # Si MySQL no responde se sigue usando la tabla anterior y se reintenta más tarde
+            self._retry_at = time.monotonic() + min(self.refresh_seconds, 60)
+            print(f"⚠️ No se pudieron recargar las promociones: {e}")
+        finally:
+            self._refreshing.clear()
+
+    @property
+    def loaded(self) -> bool:
+        return self._rules is not None
+
+    def ready(self) -> bool:
+        """
+        Indica si la tabla está cargada. Si todavía no se carga, ya venció o
+        cambió la marca compartida, lanza una recarga en segundo plano sin
+        bloquear la consulta actual.
+        """
+        ahora = time.monotonic()
+        if ahora - self._stamp_checked_at >= self.stamp_check_seconds:
+            self._stamp_checked_at = ahora
+            self._stamp_changed = self.loaded and _read_stamp() != self._stamp
+        vencida = (
+            not self.loaded
+            or self._stamp_changed
+            or ahora - self._loaded_at >= self.refresh_seconds
+            or self._loaded_on != date.today()
+        )
+        if vencida and ahora >= self._retry_at and not self._refreshing.is_set():
+            self._refreshing.set()
+            threading.Thread(target=self._reload_in_background, daemon=True).start()
+        return self.loaded
+
+    def lookup(self, clave: str, lista_precio, id_sucursal):
+        """
+        Devuelve la promoción vigente más reciente con las mismas columnas que
+        `query_sales`, o None si no hay ninguna.
+        """
+        hoy = date.today()
+        for row in self._rules.get(_key(clave, lista_precio, id_sucursal), ()):
+            fecha_inicio, fecha_fin = row[7], row[8]
+            if (fecha_inicio is None or _as_date(fecha_inicio) <= hoy) and (fecha_fin is None or _as_date(fecha_fin) >= hoy):
+                return row
+        return None
+
+    def metrics(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "combinations": len(self._rules) if self._rules else 0,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self.loaded else None,
+            "stamp": self._stamp,
+        }
+
+
+def _as_date(value) -> date:
+    return value.date() if hasattr(value, "date") else value
+
+
+promotion_rules = PromotionRules()
@@ -3,8 +3,11 @@ import json
 import mysql.connector
 from datetime import datetime
 from pydantic import BaseModel, Field
-from ct.settings.clients import ip, port, user, pwd, database
+from ct.settings.database import get_connection
 from ct.settings.config import ID_SUCURSAL
+from ct.settings.tool_cache import sales_cache, sales_key
+from ct.tools.promotion_rules import promotion_rules
+from ct.settings.executor import run_blocking
 import pymysql
 pymysql.install_as_MySQLdb()
 
@@ -69,65 +72,85 @@ LIMIT 1;
 """
 
 def sales_rules_tool(clave: str, listaPrecio: int, session_id: str) -> str:
-    cnx = None
-    cursor = None
     try:
         id_sucursal = get_id_sucursal(session_id)
 
-        cnx = mysql.connector.connect(
-            host=ip, port=port, user=user, password=pwd, database=database,
-            read_timeout=60, write_timeout=15
-        )
-        cursor = cnx.cursor()
-        cursor.execute(query_sales(), (listaPrecio, clave, id_sucursal))
-        result = cursor.fetchone()
-
-        if result:
-            precio = result[0]          # Precio original
-            precio_oferta = result[1]   # Precio de promoción
-            descuento = result[2]       # Descuento en porcentaje
-            EnCompraDe = result[3]
-            Unidades = result[4]
-            limitadoA = result[5]
-            fecha_inicio = result[7]
-            fecha_fin = result[8]
-            moneda = "MXN" if result[9] == 1 else "USD"
-
-            mensaje = []
-            ahora = datetime.now().date()
-
-            if fecha_inicio and fecha_inicio > ahora:
-                return f"{clave}: ${precio:.2f} {moneda} (sin promoción vigente)"
-
-            precio_final = precio
-
-            if precio_oferta > 0:
-                if precio_oferta > precio:
-                    return f"{clave}: Cambio de precio base a ${precio_oferta:.2f} {moneda}, no se considera promoción"
-                else:
-                    precio_final = precio_oferta
-                    mensaje.append(f"{clave}: ${precio_final:.2f} {moneda}")
-            elif descuento > 0:
-                precio_final = round(precio * (1 - descuento / 100), 2)
-                mensaje.append(f"{clave}: ~${precio:.2f}~ ${precio_final:.2f} {moneda} ({descuento:.0f}% desc)")
-            elif EnCompraDe > 0 and Unidades > 0:
-                mensaje.append(f"{clave}: En compra de {EnCompraDe}, recibe {Unidades} gratis")
-
-            if limitadoA > 0:
-                mensaje.append(f"Limitado a {limitadoA} unidades por cliente")
-            if fecha_fin:
-                mensaje.append(f"Vigente hasta el {fecha_fin.strftime('%d-%b-%Y')}")
-
-            return ", ".join(mensaje)
-
-        return f"{clave}: El producto ya no se encuentra en promoción"
+        # Con las reglas en memoria no hace falta ir a la base ni a la caché
+        if promotion_rules.ready():
+            result = promotion_rules.lookup(clave, listaPrecio, id_sucursal)
+            return _format_promotion(clave, result)
+
+        key = sales_key(clave, listaPrecio, id_sucursal)
+        cached = sales_cache.get(key)
+        if cached is not None:
+            return cached
+
+        respuesta = _sales_rules(clave, listaPrecio, id_sucursal)
+        # Solo se guardan respuestas de la base, nunca los mensajes de error
+        sales_cache.set(key, respuesta)
+        return respuesta
 
     except mysql.connector.Error as err:
         return f"Error de base de datos: {err}"
     except Exception as e:
         return f"Ocurrió un error inesperado: {e}"
+
+async def asales_rules_tool(clave: str, listaPrecio: int, session_id: str) -> str:
+    """Versión asíncrona para el agente: si hay que ir a MySQL se hace en el pool de hilos."""
+    return await run_blocking(sales_rules_tool, clave, listaPrecio, session_id)
+
+def _sales_rules(clave: str, listaPrecio: int, id_sucursal: str) -> str:
+    cnx = None
+    cursor = None
+    try:
+        cnx = get_connection()
+        cursor = cnx.cursor()
+        cursor.execute(query_sales(), (listaPrecio, clave, id_sucursal))
+        return _format_promotion(clave, cursor.fetchone())
+
     finally:
         if cursor:
             cursor.close()
         if cnx:
-            cnx.close()
\ No newline at end of file
+            cnx.close()
+
+def _format_promotion(clave: str, result) -> str:
+    if result:
+        precio = result[0]          # Precio original
+        precio_oferta = result[1]   # Precio de promoción
+        descuento = result[2]       # Descuento en porcentaje
+        EnCompraDe = result[3]
+        Unidades = result[4]
+        limitadoA = result[5]
+        fecha_inicio = result[7]
+        fecha_fin = result[8]
+        moneda = "MXN" if result[9] == 1 else "USD"
+
+        mensaje = []
+        ahora = datetime.now().date()
+
+        if fecha_inicio and fecha_inicio > ahora:
+            return f"{clave}: ${precio:.2f} {moneda} (sin promoción vigente)"
+
+        precio_final = precio
+
+        if precio_oferta > 0:
+            if precio_oferta > precio:
+                return f"{clave}: Cambio de precio base a ${precio_oferta:.2f} {moneda}, no se considera promoción"
+            else:
+                precio_final = precio_oferta
+                mensaje.append(f"{clave}: ${precio_final:.2f} {moneda}")
+        elif descuento > 0:
+            precio_final = round(precio * (1 - descuento / 100), 2)
+            mensaje.append(f"{clave}: ~${precio:.2f}~ ${precio_final:.2f} {moneda} ({descuento:.0f}% desc)")
+        elif EnCompraDe > 0 and Unidades > 0:
+            mensaje.append(f"{clave}: En compra de {EnCompraDe}, recibe {Unidades} gratis")
+
+        if limitadoA > 0:
+            mensaje.append(f"Limitado a {limitadoA} unidades por cliente")
+        if fecha_fin:
+            mensaje.append(f"Vigente hasta el {fecha_fin.strftime('%d-%b-%Y')}")
+
+        return ", ".join(mensaje)
+
+    return f"{clave}: El producto ya no se encuentra en promoción"
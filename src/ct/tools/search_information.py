@@ -1,55 +1,149 @@
 from langchain.tools import tool
 from langchain.schema import Document
 from langchain_openai import OpenAIEmbeddings
-from langchain.retrievers import EnsembleRetriever
 from langchain_community.vectorstores import FAISS
 
-from typing import List
+import re
+import time
+import threading
+from typing import List, NamedTuple
 from collections import defaultdict
 from pydantic import BaseModel, Field
 from ct.settings.clients import openai_api_key
-from ct.settings.config import SALES_PRODUCTS_VECTOR_PATH
+from ct.settings.config import (
+    SALES_PRODUCTS_VECTOR_PATH,
+    VECTOR_STORE_CHECK_SECONDS,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL,
+    RETRIEVER_K,
+    RETRIEVER_LAMBDA_MULT
+)
+from ct.vectorstore.query_embeddings import CachedQueryEmbeddings, query_embedding_cache
+from ct.settings.executor import run_blocking
+from ct.vectorstore.versions import current_version, partition_dirs, PARTITIONS
+from ct.vectorstore.mapped import open_vector_store, MappedDocstore, ClaveIndex, has_clave_index
+from ct.vectorstore.retrieval import PartitionedMMRSearch
+from ct.vectorstore.lexical import LexicalIndex, has_lexical
 
-index_por_clave = None
-ensemble_retriever = None
 
-def vector_store():
-    vectorstore = FAISS.load_local(
-        folder_path=str(SALES_PRODUCTS_VECTOR_PATH),
-        embeddings=OpenAIEmbeddings(openai_api_key=openai_api_key),
-        allow_dangerous_deserialization=True  # Necesario para FAISS
-    )
-    index_por_clave = {
-        doc.metadata["clave"]: doc for doc in vectorstore.docstore._dict.values()
-        }
+class VectorStoreSnapshot(NamedTuple):
+    """
+    Versión cargada del vector store. Es inmutable: cada búsqueda toma una
+    referencia al inicio y la conserva aunque otra versión se publique a mitad.
+    """
+    version: str
+    index_por_clave: dict[str, ClaveIndex]
+    retriever: PartitionedMMRSearch
+    vectorstores: dict[str, FAISS]
 
-    retriever_productos = vectorstore.as_retriever(
-        search_type='mmr',
-        search_kwargs={
-            "k": 8,
-            "filter": {"collection": "productos"},
-            "lambda_mult": 0.85
-        }
-    )
 
-    retriever_promociones = vectorstore.as_retriever(
-        search_type='mmr',
-        search_kwargs={
-            "k": 10,
-            "filter": {"collection": "promociones"},
-            "lambda_mult": 0.85
+# Compartido por todas las versiones del vector store: sobrevive a las recargas
+query_embeddings = CachedQueryEmbeddings(
+    OpenAIEmbeddings(openai_api_key=openai_api_key),
+    query_embedding_cache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL)
+)
+
+_snapshot: VectorStoreSnapshot | None = None
+_snapshot_lock = threading.Lock()
+_last_check = 0.0
+# Última versión publicada que no se pudo cargar: no se reintenta hasta que cambie CURRENT
+_failed_version: str | None = None
+
+def _iter_metadata(vectorstore: FAISS):
+    """Recorre (id, metadata) de cada chunk sin importar el tipo de docstore."""
+    if isinstance(vectorstore.docstore, MappedDocstore):
+        yield from vectorstore.docstore.iter_metadata()
+    else:
+        for doc_id, doc in vectorstore.docstore._dict.items():
+            yield doc_id, doc.metadata
+
+def vector_store(path=None):
+    path = path or current_version(SALES_PRODUCTS_VECTOR_PATH)
+    embeddings = query_embeddings
+    particiones = partition_dirs(path)
+    if particiones:
+        # Cada colección tiene su propio índice: se busca sin filtro
+        vectorstores = {
+            collection: open_vector_store(particion, embeddings=embeddings)
+            for collection, particion in particiones.items()
+        }
+        lexical = {
+            collection: LexicalIndex(particion)
+            for collection, particion in particiones.items() if has_lexical(particion)
         }
+    else:
+        # Versión anterior con ambas colecciones en un solo índice
+        combinado = open_vector_store(path, embeddings=embeddings)
+        vectorstores = {collection: combinado for collection in PARTITIONS}
+        lexical = {}
+
+    # Índice clave → chunks de cada colección. Las versiones recientes lo traen
+    # precalculado; para las anteriores se arma recorriendo el docstore.
+    index_por_clave = {}
+    for collection, vectorstore in vectorstores.items():
+        particion = particiones.get(collection)
+        if particion is not None and has_clave_index(particion):
+            index_por_clave[collection] = ClaveIndex.load(particion)
+        else:
+            index_por_clave[collection] = ClaveIndex.from_pairs(
+                (metadata.get("clave"), doc_id)
+                for doc_id, metadata in _iter_metadata(vectorstore)
+                if metadata.get("collection") == collection
+            )
+
+    retriever = PartitionedMMRSearch(
+        vectorstores,
+        embeddings,
+        k=RETRIEVER_K,
+        lambda_mult=RETRIEVER_LAMBDA_MULT,
+        combined=not particiones,
+        lexical=lexical
     )
-    return index_por_clave, EnsembleRetriever(
-    retrievers=[retriever_productos, retriever_promociones]
-)
+    return index_por_clave, retriever, vectorstores
 
 def reload_vector_store():
-    global index_por_clave, ensemble_retriever
-    index_por_clave, ensemble_retriever = vector_store()
-    print("✅ Vector store recargado exitosamente en memoria.")
+    """Carga la versión publicada y la deja como snapshot activo del proceso."""
+    global _snapshot, _failed_version
+    with _snapshot_lock:
+        inicio = time.perf_counter()
+        path = current_version(SALES_PRODUCTS_VECTOR_PATH)
+        index_por_clave, retriever, vectorstores = vector_store(path)
+        _snapshot = VectorStoreSnapshot(path.name, index_por_clave, retriever, vectorstores)
+        _failed_version = None
+    print(f"✅ Vector store recargado exitosamente en memoria ({path.name}, {time.perf_counter() - inicio:.2f} s).")
     return True
 
+def _reload_in_background(version: str):
+    global _failed_version
+    try:
+        reload_vector_store()
+    except Exception as e:
+        # Si la nueva versión no carga, se sigue sirviendo la anterior y no se
+        # vuelve a intentar hasta que se publique otra
+        _failed_version = version
+        print(f"⚠️ No se pudo cargar la versión {version}; se ignora hasta que se publique otra: {e}")
+
+def get_snapshot() -> VectorStoreSnapshot:
+    """
+    Devuelve el snapshot activo. Como máximo cada `VECTOR_STORE_CHECK_SECONDS`
+    revisa si se publicó otra versión y, de ser así, la carga en segundo plano
+    sin reiniciar el worker. Mientras tanto, y para las búsquedas que ya
+    tomaron su snapshot, se sigue sirviendo la versión anterior. Una versión
+    que falló al cargar no se reintenta hasta que CURRENT cambie.
+    """
+    global _last_check
+    now = time.monotonic()
+    if now - _last_check >= VECTOR_STORE_CHECK_SECONDS:
+        _last_check = now
+        publicada = current_version(SALES_PRODUCTS_VECTOR_PATH)
+        if (
+            publicada is not None
+            and publicada.name not in (_snapshot.version, _failed_version)
+            and not _snapshot_lock.locked()
+        ):
+            threading.Thread(target=_reload_in_background, args=(publicada.name,), daemon=True).start()
+    return _snapshot
+
 
 # --- CARGA INICIAL ---
 reload_vector_store()
@@ -82,26 +176,57 @@ def _group_docs_by_key(docs: List[Document]) -> dict:
 
 @tool(description="Busca información detallada de productos y promociones. Agrupa la información por la clave del producto para dar un contexto completo.")
 def search_information_tool(query: str) -> dict[str, dict[str, str]]:
-    docs = ensemble_retriever.invoke(query)
+    docs = get_snapshot().retriever.invoke(query)
     return _group_docs_by_key(docs)
 
+async def asearch_information_tool(query: str) -> dict[str, dict[str, str]]:
+    """Versión asíncrona para el agente: embedding (con caché) y FAISS corren en el pool de hilos."""
+    return await run_blocking(search_information_tool.func, query)
+
 class ClaveInput(BaseModel):
     clave: str = Field(description="Clave del producto en MAYUSCULAS")
 
+# Tokens con forma de clave CT: letras, dígitos y guiones, con al menos un dígito
+_CLAVE_CANDIDATA = re.compile(r"(?<![\w-])(?=[\w-]*\d)[A-Za-z0-9][A-Za-z0-9-]{2,24}(?![\w-])")
+
+def find_claves(text: str, limit: int = 5) -> list[str]:
+    """
+    Claves válidas del catálogo publicado que aparecen en el texto. Cada token
+    candidato se busca en el índice ordenado de claves (búsqueda binaria, sin
+    falsos positivos), así que no hace falta embeber ni llamar al LLM.
+    """
+    indices = get_snapshot().index_por_clave.values()
+    claves = []
+    for match in _CLAVE_CANDIDATA.finditer(text):
+        clave = match.group().upper()
+        if clave not in claves and any(clave in index for index in indices):
+            claves.append(clave)
+            if len(claves) == limit:
+                break
+    return claves
+
 def search_by_key_tool(clave: str) -> dict:
     """
-    Busca documentos por clave en el índice ya generado.
+    Busca todos los chunks de una clave en el índice ya generado y devuelve el
+    contexto completo del producto y de sus promociones.
     """
-    doc = index_por_clave.get(clave)
-    if not doc:
+    snapshot = get_snapshot()
+    docs = []
+    for collection, index in snapshot.index_por_clave.items():
+        docstore = snapshot.vectorstores[collection].docstore
+        docs.extend(doc for doc in map(docstore.search, index.get(clave)) if isinstance(doc, Document))
+
+    if not docs:
         return {
             "status": "error",
             "message": "Producto no encontrado actualmente"
         }
 
-    # Si hay más de un documento por clave, puedes adaptar esto:
     return {
         "status": "ok",
-        "data": _group_docs_by_key([doc])
+        "data": _group_docs_by_key(docs)
     }
 
+async def asearch_by_key_tool(clave: str) -> dict:
+    """Versión asíncrona para el agente: la lectura del docstore corre en el pool de hilos."""
+    return await run_blocking(search_by_key_tool, clave)
@@ -3,15 +3,12 @@ from pymongo import MongoClient
 import locale
 import pytz
 import re
+import asyncio
 import mysql.connector
-from ct.settings.clients import (
-    mongo_collection_pedidos, 
-    mongo_uri,
-    ip,
-    port,
-    user,
-    pwd,
-    database)
+from ct.settings.clients import mongo_collection_pedidos, mongo_uri
+from ct.settings.database import get_connection
+from ct.settings.mongo_indexes import PEDIDOS_INDEXES, ensure_indexes
+from ct.settings.executor import run_blocking
 from pymongo import ASCENDING
 import pymysql
 pymysql.install_as_MySQLdb()
@@ -21,6 +18,11 @@ client = MongoClient(mongo_uri).get_default_database()
 pedidos = client[mongo_collection_pedidos]
 cdmx = pytz.timezone("America/Mexico_City")
 
+# --- CARGA INICIAL ---
+# Sin estos índices cada consulta de estatus recorre toda la colección de pedidos.
+# Aquí solo se verifican; se crean con `python -m ct.ETL.create_mongo_indexes`.
+pedidos_indexes = ensure_indexes(pedidos, PEDIDOS_INDEXES)
+
 class StatusInput(BaseModel):
     factura: str = Field(description="Número de factura para seguir y encontrar su estatus")
     session_id : str = Field(description="Con la sesión verificamos que el usuario que pregunta tenga el permiso de saber el estado")
@@ -35,10 +37,7 @@ def descargas_enviadas(factura: str):
     cnx = None
     cursor = None
     try:
-        cnx = mysql.connector.connect(
-            host=ip, port=port, user=user, password=pwd, database=database,
-            read_timeout=60, write_timeout=15
-        )
+        cnx = get_connection()
         cursor = cnx.cursor()
         cursor.execute(query, (factura,))
         result = cursor.fetchone()
@@ -57,7 +56,7 @@ def descargas_enviadas(factura: str):
             cnx.close()
     pass
 
-def status_tool(factura: str, session_id: str) -> str:
+def _filtro(factura: str, session_id: str) -> dict:
     cliente = session_id.split('_')[0]
 
     if re.match(r"^W[A-Z0-9]{2}-", factura):
@@ -70,13 +69,33 @@ def status_tool(factura: str, session_id: str) -> str:
     if not re.match(r"^(\d{2})CTIN", session_id):
         # Si es un cliente, solo puede ver sus propios pedidos.
         filtro_de_consulta["pedido.encabezado.cliente"] = cliente
+    return filtro_de_consulta
 
-    pedido = pedidos.find_one(
+def _find_pedido(filtro_de_consulta: dict) -> dict | None:
+    return pedidos.find_one(
         filtro_de_consulta,
-        {"_id": 0, "estatus": 1, "pedido.detalle.producto": 1},
-        sort=[("pedido.fecha", ASCENDING)]  # Asumo que ASCENDING está definido
+        {"_id": 0, "estatus": 1, "pedido.detalle.producto.cantidad": 1},
+        sort=[("pedido.fecha", ASCENDING)]
+    )
+
+async def astatus_tool(factura: str, session_id: str) -> str:
+    """
+    Versión asíncrona para el agente: la búsqueda en Mongo y el conteo de
+    descargas en MySQL corren a la vez en el pool de hilos, así que un pedido
+    ESD terminado no suma la latencia de las dos bases.
+    """
+    pedido, descargas = await asyncio.gather(
+        run_blocking(_find_pedido, _filtro(factura, session_id)),
+        run_blocking(descargas_enviadas, factura)
     )
+    return _status_message(pedido, lambda: descargas)
+
+def status_tool(factura: str, session_id: str) -> str:
+    pedido = _find_pedido(_filtro(factura, session_id))
+    return _status_message(pedido, lambda: descargas_enviadas(factura))
 
+def _status_message(pedido: dict | None, descargas) -> str:
+    """Mensaje del último estatus. `descargas()` da el conteo de descargas ESD enviadas."""
     if not pedido:
         return "¿El folio es correcto?, si es correcto, no se encontró el pedido."
     
@@ -95,7 +114,7 @@ def status_tool(factura: str, session_id: str) -> str:
         case "Terminado" | "FacturaESDActualizada":
             productos = pedido['pedido']['detalle']['producto']
             total = sum(producto['cantidad'] for producto in productos)
-            return f"ESD totales: {total}, total de descargas enviadas: {descargas_enviadas(factura)}"
+            return f"ESD totales: {total}, total de descargas enviadas: {descargas()}"
         case "Preautorizado" | "Autorizado":
             return "Procesando tu pedido"
         case "Transito":
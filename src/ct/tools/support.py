@@ -6,8 +6,9 @@ from pydantic import BaseModel, Field
 from langchain_ollama import OllamaEmbeddings
 from langchain_openai import OpenAIEmbeddings
 from ct.settings.clients import openai_api_key
-from langchain_community.vectorstores import FAISS
 from ct.settings.config import SUPPORT_INFO_VECTOR_PATH
+from ct.vectorstore.mapped import open_vector_store
+from ct.settings.executor import run_blocking
 
 # Define los filtros disponibles usando Literal para que el agente los conozca.
 # Esto es más robusto que solo mencionarlos en el prompt, ya que forma parte del "schema" de la herramienta.
@@ -23,34 +24,22 @@ class SupportInput(BaseModel):
 #embeddings = OllamaEmbeddings(model="snowflake-arctic-embed2:568m")
 embeddings = OpenAIEmbeddings(api_key=openai_api_key)
 
-vector_store = FAISS.load_local(
-    SUPPORT_INFO_VECTOR_PATH,
-    embeddings=embeddings,
-    allow_dangerous_deserialization=True
-)
-def get_faiss_retriever(collection_filter: str):
-    """
-    Crea y devuelve un retriever de FAISS configurado para un filtro de colección específico.
-    """    
-    return vector_store.as_retriever(
-        search_type="similarity",
-        search_kwargs={
-            'k': 15,
-            'filter': {'collection': collection_filter},
-        }
-    )
+# Índice mapeado a memoria: los workers de gunicorn comparten las mismas páginas
+vector_store = open_vector_store(SUPPORT_INFO_VECTOR_PATH, embeddings=embeddings)
 
-def get_support_info(query: str, filters: List[SupportFilter]) -> str:
+def _support_context(query_embedding: List[float], filters: List[SupportFilter]) -> str:
     """
-    Recupera información de la base de datos vectorial basada en una consulta y una lista de filtros.
-    El agente debe inferir los filtros correctos a partir de la consulta del usuario.
+    Busca el embedding de la consulta en cada colección filtrada y arma el contexto.
     """
     context_parts = []
 
     for collection_filter in filters:
         try:
-            retriever = get_faiss_retriever(collection_filter=collection_filter)
-            docs = retriever.invoke(query)
+            docs = vector_store.similarity_search_by_vector(
+                query_embedding,
+                k=15,
+                filter={'collection': collection_filter},
+            )
             if docs:
                 # Agrega un título para separar el contexto de cada filtro
                 context_parts.append(f"--- Información sobre: {collection_filter} ---\n")
@@ -65,6 +54,31 @@ def get_support_info(query: str, filters: List[SupportFilter]) -> str:
         
     return "\n".join(context_parts)
 
+def get_support_info(query: str, filters: List[SupportFilter]) -> str:
+    """
+    Recupera información de la base de datos vectorial basada en una consulta y una lista de filtros.
+    El agente debe inferir los filtros correctos a partir de la consulta del usuario.
+    La consulta se embebe una sola vez para todos los filtros.
+    """
+    try:
+        query_embedding = embeddings.embed_query(query)
+    except Exception as e:
+        print(f"Error embedding support query: {e}")
+        return "No se encontró información relevante para los filtros seleccionados."
+    return _support_context(query_embedding, filters)
+
+async def aget_support_info(query: str, filters: List[SupportFilter]) -> str:
+    """
+    Versión asíncrona para el agente: el embedding usa el cliente async de
+    OpenAI y la búsqueda en FAISS corre en el pool de hilos.
+    """
+    try:
+        query_embedding = await embeddings.aembed_query(query)
+    except Exception as e:
+        print(f"Error embedding support query: {e}")
+        return "No se encontró información relevante para los filtros seleccionados."
+    return await run_blocking(_support_context, query_embedding, filters)
+
 # def get_support_info(query: str, filters: List[str]):
 
 #     results1 = retriever1.invoke(query)
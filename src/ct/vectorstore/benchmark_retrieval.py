@@ -0,0 +1,103 @@
+"""
+Compara la búsqueda MMR vectorizada (`PartitionedMMRSearch`) contra el
+`EnsembleRetriever` de LangChain sobre la versión publicada del vector store:
+verifica que devuelvan los mismos documentos en el mismo orden y mide la latencia.
+
+    python -m ct.vectorstore.benchmark_retrieval [directorio_version] [--queries 200]
+
+Las consultas son vectores del propio índice con ruido, así que no se llama al
+API de OpenAI; el tiempo de embebido queda fuera de la medición.
+"""
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from langchain_core.embeddings import Embeddings
+from langchain.retrievers import EnsembleRetriever
+
+from ct.settings.config import SALES_PRODUCTS_VECTOR_PATH, RETRIEVER_K, RETRIEVER_LAMBDA_MULT
+from ct.vectorstore.versions import current_version, partition_dirs, PARTITIONS
+from ct.vectorstore.mapped import open_vector_store
+from ct.vectorstore.retrieval import PartitionedMMRSearch
+
+
+class _PrecomputedEmbeddings(Embeddings):
+    """Devuelve el vector ya calculado de cada consulta ("q0", "q1", ...)."""
+
+    def __init__(self):
+        self.vectores = None
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.vectores[int(text[1:])].tolist()
+
+
+def _percentiles(tiempos: list[float]) -> str:
+    ms = np.asarray(tiempos) * 1000
+    return f"p50 {np.percentile(ms, 50):.2f} ms, p95 {np.percentile(ms, 95):.2f} ms, media {ms.mean():.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", nargs="?", type=Path)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    path = args.path or current_version(SALES_PRODUCTS_VECTOR_PATH)
+    embeddings = _PrecomputedEmbeddings()
+    particiones = partition_dirs(path)
+    if particiones:
+        vectorstores = {collection: open_vector_store(p, embeddings=embeddings) for collection, p in particiones.items()}
+    else:
+        combinado = open_vector_store(path, embeddings=embeddings)
+        vectorstores = {collection: combinado for collection in PARTITIONS}
+
+    # Consultas: vectores almacenados con ruido, tomados de todas las colecciones
+    rng = np.random.default_rng(0)
+    base = np.vstack([
+        vs.index.reconstruct_batch(rng.choice(vs.index.ntotal, size=min(args.queries, vs.index.ntotal), replace=False).astype(np.int64))
+        for vs in {id(vs): vs for vs in vectorstores.values()}.values()
+    ])
+    base = base[rng.choice(len(base), size=min(args.queries, len(base)), replace=False)]
+    consultas = (base + rng.normal(scale=base.std() * 0.5, size=base.shape)).astype(np.float32)
+    embeddings.vectores = consultas
+
+    retrievers = []
+    for collection, vectorstore in vectorstores.items():
+        search_kwargs = {"k": RETRIEVER_K[collection], "lambda_mult": RETRIEVER_LAMBDA_MULT}
+        if not particiones:
+            search_kwargs["filter"] = {"collection": collection}
+        retrievers.append(vectorstore.as_retriever(search_type="mmr", search_kwargs=search_kwargs))
+    ensemble = EnsembleRetriever(retrievers=retrievers)
+    vectorizado = PartitionedMMRSearch(
+        vectorstores,
+        embeddings,
+        k=RETRIEVER_K,
+        lambda_mult=RETRIEVER_LAMBDA_MULT,
+        combined=not particiones
+    )
+
+    tiempos_ensemble, tiempos_vectorizado, diferencias = [], [], 0
+    for i in range(len(consultas)):
+        inicio = time.perf_counter()
+        esperado = ensemble.invoke(f"q{i}")
+        tiempos_ensemble.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        obtenido = vectorizado.invoke(f"q{i}")
+        tiempos_vectorizado.append(time.perf_counter() - inicio)
+
+        if [doc.page_content for doc in esperado] != [doc.page_content for doc in obtenido]:
+            diferencias += 1
+
+    print(f"Versión: {path.name} ({'particionada' if particiones else 'combinada'}), {len(consultas)} consultas")
+    print(f"EnsembleRetriever:    {_percentiles(tiempos_ensemble)}")
+    print(f"PartitionedMMRSearch: {_percentiles(tiempos_vectorizado)}")
+    print(f"Aceleración (media):  {np.mean(tiempos_ensemble) / np.mean(tiempos_vectorizado):.1f}x")
+    print(f"Consultas con resultados distintos: {diferencias}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import re
+import json
+import math
+import unicodedata
+import numpy as np
+from pathlib import Path
+from collections import Counter
+from ct.vectorstore.mapped import MappedDocstore
+
+# Índice invertido BM25 que se guarda junto a cada vector store mapeable:
+#   lexical_terms.json    vocabulario (la posición es el id del término) y longitud media
+#   lexical_offsets.npy   int64[v + 1], inicio de la lista de cada término
+#   lexical_docs.npy      int32[p], chunks de cada término (ordenados por término)
+#   lexical_tf.npy        uint16[p], frecuencia del término en cada chunk
+#   lexical_doclen.npy    int32[n], número de tokens de cada chunk
+# Las posiciones de los chunks son las mismas que en el índice FAISS.
+TERMS_FILE = "lexical_terms.json"
+OFFSETS_FILE = "lexical_offsets.npy"
+DOCS_FILE = "lexical_docs.npy"
+TF_FILE = "lexical_tf.npy"
+DOCLEN_FILE = "lexical_doclen.npy"
+
+_TOKEN = re.compile(r"[^\W_]+(?:[-./][^\W_]+)*")
+_SEPARATORS = re.compile(r"[-./]")
+_IDENTIFIER = re.compile(r"^(?=.*\d)(?=.*[a-z])[a-z0-9]{4,}$")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Minúsculas sin acentos. Los tokens compuestos como "LJ-M404n" se indexan
+    completos, sin separadores ("ljm404n") y por partes, para que un número de
+    modelo coincida sin importar cómo lo escriba el cliente.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    tokens = []
+    for match in _TOKEN.finditer(text):
+        token = match.group()
+        tokens.append(token)
+        if _SEPARATORS.search(token):
+            tokens.append(_SEPARATORS.sub("", token))
+            tokens.extend(part for part in _SEPARATORS.split(token) if part)
+    return tokens
+
+
+def is_identifier(token: str) -> bool:
+    """Tokens con forma de clave o número de modelo: letras y dígitos, 4+ caracteres."""
+    return bool(_IDENTIFIER.match(token))
+
+
+def save_lexical(path: Path) -> None:
+    """Construye el índice BM25 a partir de los chunks de un vector store mapeable."""
+    path = Path(path)
+    docstore = MappedDocstore(path)
+    total = len(docstore)
+    vocabulario = {}
+    term_ids, doc_ids, tfs = [], [], []
+    doclen = np.zeros(total, dtype=np.int32)
+
+    for i in range(total):
+        tokens = tokenize(docstore.text(i))
+        doclen[i] = len(tokens)
+        for term, tf in Counter(tokens).items():
+            term_ids.append(vocabulario.setdefault(term, len(vocabulario)))
+            doc_ids.append(i)
+            tfs.append(min(tf, np.iinfo(np.uint16).max))
+
+    term_ids = np.asarray(term_ids, dtype=np.int64)
+    orden = np.argsort(term_ids, kind="stable")
+    offsets = np.zeros(len(vocabulario) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(term_ids, minlength=len(vocabulario)))
+
+    np.save(path / OFFSETS_FILE, offsets)
+    np.save(path / DOCS_FILE, np.asarray(doc_ids, dtype=np.int32)[orden])
+    np.save(path / TF_FILE, np.asarray(tfs, dtype=np.uint16)[orden])
+    np.save(path / DOCLEN_FILE, doclen)
+    with open(path / TERMS_FILE, "w", encoding="utf-8") as f:
+        json.dump({"terms": list(vocabulario), "avgdl": float(doclen.mean()) if total else 0.0}, f, ensure_ascii=False)
+
+
+def has_lexical(path: Path) -> bool:
+    return (Path(path) / TERMS_FILE).exists()
+
+
+class LexicalIndex:
+    """Búsqueda BM25 (k1 = 1.5, b = 0.75) sobre el índice invertido mapeado a memoria."""
+
+    def __init__(self, path: Path, k1: float = 1.5, b: float = 0.75):
+        path = Path(path)
+        self.k1 = k1
+        self.b = b
+        with open(path / TERMS_FILE, "r", encoding="utf-8") as f:
+            terms = json.load(f)
+        self.vocabulario = {term: i for i, term in enumerate(terms["terms"])}
+        self.avgdl = terms["avgdl"] or 1.0
+        self._offsets = np.load(path / OFFSETS_FILE, mmap_mode="r")
+        self._docs = np.load(path / DOCS_FILE, mmap_mode="r")
+        self._tf = np.load(path / TF_FILE, mmap_mode="r")
+        self._doclen = np.load(path / DOCLEN_FILE, mmap_mode="r")
+        self.total = len(self._doclen)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.vocabulario
+
+    def search(self, tokens: list[str], k: int) -> list[int]:
+        """Posiciones de los `k` chunks con mayor puntaje BM25 para los tokens dados."""
+        if k <= 0:
+            return []
+        puntajes = np.zeros(self.total, dtype=np.float32)
+        for term in set(tokens):
+            term_id = self.vocabulario.get(term)
+            if term_id is None:
+                continue
+            inicio, fin = self._offsets[term_id], self._offsets[term_id + 1]
+            docs = self._docs[inicio:fin]
+            tf = self._tf[inicio:fin].astype(np.float32)
+            df = fin - inicio
+            idf = math.log(1 + (self.total - df + 0.5) / (df + 0.5))
+            norma = self.k1 * (1 - self.b + self.b * self._doclen[docs] / self.avgdl)
+            puntajes[docs] += idf * tf * (self.k1 + 1) / (tf + norma)
+
+        candidatos = np.flatnonzero(puntajes)
+        if len(candidatos) > k:
+            candidatos = candidatos[np.argpartition(-puntajes[candidatos], k - 1)[:k]]
+        # Mayor puntaje primero; en empate, la posición menor
+        return [int(i) for i in candidatos[np.lexsort((candidatos, -puntajes[candidatos]))]]
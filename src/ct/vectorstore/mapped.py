@@ -0,0 +1,318 @@
+import os
+import json
+import mmap
+import pickle
+import faiss
+import numpy as np
+from pathlib import Path
+from collections import defaultdict
+from collections.abc import Mapping
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+
+# Formato en disco de un vector store "mapeable" y compacto (sin pickle):
+#   vectors.faiss      índice FAISS (faiss.write_index)
+#   prefixes.bin       prefijos compartidos ("clave contexto ") en UTF-8, uno por clave
+#   prefix_offsets.npy int64[p + 1], inicio de cada prefijo dentro de prefixes.bin
+#   bodies.bin         resto del page_content de cada chunk en UTF-8
+#   body_offsets.npy   int64[n + 1], inicio de cada cuerpo dentro de bodies.bin
+#   chunk_prefix.npy   int32[n], prefijo que corresponde a cada chunk
+#   columns.json       valores únicos de cada campo de metadata (collection, clave, ...)
+#   meta_codes.npy     int32[n, campos], posición del valor en columns.json (-1 = ausente)
+#   claves.npy         claves ordenadas
+#   clave_offsets.npy  int64[c + 1], inicio de los chunks de cada clave en clave_chunks.npy
+#   clave_chunks.npy   int32[n], posiciones de los chunks agrupadas por clave, en orden
+# Cada chunk repite "clave contexto" al inicio: aquí ese texto se guarda una sola
+# vez por clave, y los campos de metadata se internan como códigos enteros.
+# Todos los workers abren estos archivos en modo solo lectura con mmap, así que
+# comparten las mismas páginas del caché del sistema operativo.
+INDEX_FILE = "vectors.faiss"
+PREFIXES_FILE = "prefixes.bin"
+PREFIX_OFFSETS_FILE = "prefix_offsets.npy"
+BODIES_FILE = "bodies.bin"
+BODY_OFFSETS_FILE = "body_offsets.npy"
+CHUNK_PREFIX_FILE = "chunk_prefix.npy"
+COLUMNS_FILE = "columns.json"
+META_CODES_FILE = "meta_codes.npy"
+CLAVES_FILE = "claves.npy"
+CLAVE_OFFSETS_FILE = "clave_offsets.npy"
+CLAVE_CHUNKS_FILE = "clave_chunks.npy"
+
+
+def _write_blobs(path: Path, blobs, data_file: str, offsets_file: str) -> None:
+    offsets = [0]
+    with open(path / data_file, "wb") as f:
+        for blob in blobs:
+            f.write(blob)
+            offsets.append(offsets[-1] + len(blob))
+    np.save(path / offsets_file, np.asarray(offsets, dtype=np.int64))
+
+
+def _map_file(path: Path):
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_index_mmap(path: Path) -> faiss.Index:
+    """
+    Lee un índice FAISS mapeándolo a memoria en lugar de copiarlo al heap del
+    proceso. Si la versión de FAISS o el tipo de índice no lo permiten, se lee
+    de forma normal.
+    """
+    # IO_FLAG_MMAP mapea las listas invertidas de los índices IVF e
+    # IO_FLAG_MMAP_IFC (FAISS >= 1.9) los códigos de los índices planos. Los IVF
+    # no aceptan ambas banderas a la vez, por eso se prueban en orden.
+    opciones = [faiss.IO_FLAG_MMAP]
+    if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        opciones.insert(0, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_MMAP_IFC)
+    error = None
+    for flags in opciones:
+        try:
+            return faiss.read_index(str(path), flags)
+        except RuntimeError as e:
+            error = e
+    print(f"⚠️ No se pudo mapear {path} a memoria ({error}); se carga completo.")
+    return faiss.read_index(str(path))
+
+
+class PositionalIds(Mapping):
+    """
+    `index_to_docstore_id` sin diccionario: la posición en el índice FAISS es
+    directamente el id del documento.
+    """
+
+    def __init__(self, total: int):
+        self.total = total
+
+    def __getitem__(self, i):
+        if 0 <= i < self.total:
+            return int(i)
+        raise KeyError(i)
+
+    def __iter__(self):
+        return iter(range(self.total))
+
+    def __len__(self):
+        return self.total
+
+
+class ClaveIndex:
+    """
+    Índice clave → ids de todos sus chunks, en el orden del texto original.
+    Las claves están ordenadas, así que una búsqueda es un `searchsorted`.
+    """
+
+    def __init__(self, claves: np.ndarray, offsets: np.ndarray, ids):
+        self.claves = claves
+        self.offsets = offsets
+        self.ids = ids
+
+    @classmethod
+    def load(cls, path: Path) -> "ClaveIndex":
+        path = Path(path)
+        return cls(
+            np.load(path / CLAVES_FILE, mmap_mode="r"),
+            np.load(path / CLAVE_OFFSETS_FILE, mmap_mode="r"),
+            np.load(path / CLAVE_CHUNKS_FILE, mmap_mode="r")
+        )
+
+    @classmethod
+    def from_pairs(cls, pares) -> "ClaveIndex":
+        """Construye el índice en memoria a partir de pares (clave, id) en orden."""
+        grupos = defaultdict(list)
+        for clave, doc_id in pares:
+            if clave is not None:
+                grupos[clave].append(doc_id)
+        claves = sorted(grupos)
+        offsets = np.zeros(len(claves) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(grupos[clave]) for clave in claves])
+        ids = [doc_id for clave in claves for doc_id in grupos[clave]]
+        return cls(np.asarray(claves, dtype=str), offsets, ids)
+
+    def _position(self, clave: str) -> int | None:
+        i = int(np.searchsorted(self.claves, clave))
+        if i < len(self.claves) and self.claves[i] == clave:
+            return i
+        return None
+
+    def get(self, clave: str) -> list:
+        i = self._position(clave)
+        if i is None:
+            return []
+        return [doc_id.item() if isinstance(doc_id, np.generic) else doc_id for doc_id in self.ids[self.offsets[i]:self.offsets[i + 1]]]
+
+    def __contains__(self, clave: str) -> bool:
+        return self._position(clave) is not None
+
+    def __len__(self) -> int:
+        return len(self.claves)
+
+
+def has_clave_index(path: Path) -> bool:
+    return (Path(path) / CLAVES_FILE).exists()
+
+
+class MappedDocstore(Docstore):
+    """
+    Docstore columnar de solo lectura respaldado por archivos mapeados a memoria.
+    Todos los archivos se abren al construirlo (los textos quedan mapeados y las
+    tablas de valores de metadata en memoria), así que un snapshot sigue
+    funcionando aunque `prune_versions` borre después su directorio. Los
+    `Document` se construyen al consultarlos.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._prefixes = _map_file(self.path / PREFIXES_FILE)
+        self._prefix_offsets = np.load(self.path / PREFIX_OFFSETS_FILE, mmap_mode="r")
+        self._bodies = _map_file(self.path / BODIES_FILE)
+        self._body_offsets = np.load(self.path / BODY_OFFSETS_FILE, mmap_mode="r")
+        self._chunk_prefix = np.load(self.path / CHUNK_PREFIX_FILE, mmap_mode="r")
+        self._meta_codes = np.load(self.path / META_CODES_FILE, mmap_mode="r")
+        with open(self.path / COLUMNS_FILE, "r", encoding="utf-8") as f:
+            columns = json.load(f)
+        self._columns = columns["keys"], [columns["values"][key] for key in columns["keys"]]
+
+    def __len__(self) -> int:
+        return len(self._body_offsets) - 1
+
+    def text(self, i: int) -> str:
+        p = self._chunk_prefix[i]
+        prefix = self._prefixes[self._prefix_offsets[p]:self._prefix_offsets[p + 1]]
+        body = self._bodies[self._body_offsets[i]:self._body_offsets[i + 1]]
+        return (prefix + body).decode("utf-8")
+
+    def metadata(self, i: int) -> dict:
+        keys, values = self._columns
+        return {
+            key: values[k][code]
+            for k, (key, code) in enumerate(zip(keys, self._meta_codes[i]))
+            if code >= 0
+        }
+
+    def search(self, search) -> Document | str:
+        try:
+            i = int(search)
+        except (TypeError, ValueError):
+            return f"ID {search} not found."
+        if not 0 <= i < len(self):
+            return f"ID {search} not found."
+        return Document(page_content=self.text(i), metadata=self.metadata(i))
+
+    def iter_metadata(self):
+        for i in range(len(self)):
+            yield i, self.metadata(i)
+
+    def add(self, texts: dict) -> None:
+        raise NotImplementedError("MappedDocstore es de solo lectura.")
+
+    def delete(self, ids: list) -> None:
+        raise NotImplementedError("MappedDocstore es de solo lectura.")
+
+
+def save_mapped(vector_store: FAISS, path: Path) -> None:
+    """Guarda un vector store de LangChain en el formato mapeable y compacto."""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    total = vector_store.index.ntotal
+    docs = [vector_store.docstore.search(vector_store.index_to_docstore_id[i]) for i in range(total)]
+    faiss.write_index(vector_store.index, str(path / INDEX_FILE))
+
+    # Prefijo compartido: el prefijo común más largo de los chunks de cada clave
+    textos = [doc.page_content.encode("utf-8") for doc in docs]
+    chunks_por_clave = defaultdict(list)
+    for i, doc in enumerate(docs):
+        chunks_por_clave[doc.metadata.get("clave")].append(i)
+
+    prefixes = []
+    chunk_prefix = np.zeros(total, dtype=np.int32)
+    cortes = [0] * total
+    for clave, posiciones in chunks_por_clave.items():
+        # Se compara en bytes; el texto se decodifica ya unido, así que el corte
+        # puede caer a mitad de un carácter multibyte sin problema
+        prefix = os.path.commonprefix([textos[i] for i in posiciones]) if clave is not None else b""
+        for i in posiciones:
+            chunk_prefix[i] = len(prefixes)
+            cortes[i] = len(prefix)
+        prefixes.append(prefix)
+
+    # Índice por clave: posiciones de sus chunks agrupadas, con las claves ordenadas
+    claves = sorted(clave for clave in chunks_por_clave if clave is not None)
+    clave_offsets = np.zeros(len(claves) + 1, dtype=np.int64)
+    clave_offsets[1:] = np.cumsum([len(chunks_por_clave[clave]) for clave in claves])
+    np.save(path / CLAVES_FILE, np.asarray(claves, dtype=str))
+    np.save(path / CLAVE_OFFSETS_FILE, clave_offsets)
+    np.save(path / CLAVE_CHUNKS_FILE, np.asarray([i for clave in claves for i in chunks_por_clave[clave]], dtype=np.int32))
+
+    _write_blobs(path, prefixes, PREFIXES_FILE, PREFIX_OFFSETS_FILE)
+    _write_blobs(path, (texto[corte:] for texto, corte in zip(textos, cortes)), BODIES_FILE, BODY_OFFSETS_FILE)
+    np.save(path / CHUNK_PREFIX_FILE, chunk_prefix)
+
+    # Metadata columnar: cada valor distinto se guarda una vez y los chunks lo referencian por código
+    keys = list(dict.fromkeys(key for doc in docs for key in doc.metadata))
+    values = {key: [] for key in keys}
+    posiciones = {key: {} for key in keys}
+    codes = np.full((total, len(keys)), -1, dtype=np.int32)
+    for i, doc in enumerate(docs):
+        for k, key in enumerate(keys):
+            if key not in doc.metadata:
+                continue
+            valor = doc.metadata[key]
+            llave = json.dumps(valor, sort_keys=True, ensure_ascii=False)
+            if llave not in posiciones[key]:
+                posiciones[key][llave] = len(values[key])
+                values[key].append(valor)
+            codes[i, k] = posiciones[key][llave]
+
+    with open(path / COLUMNS_FILE, "w", encoding="utf-8") as f:
+        json.dump({"keys": keys, "values": values}, f, ensure_ascii=False)
+    np.save(path / META_CODES_FILE, codes)
+
+
+def is_mapped(path: Path) -> bool:
+    return (Path(path) / INDEX_FILE).exists()
+
+
+def load_mapped(path: Path, embeddings: Embeddings) -> FAISS:
+    path = Path(path)
+    index = read_index_mmap(path / INDEX_FILE)
+    docstore = MappedDocstore(path)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=PositionalIds(index.ntotal)
+    )
+
+
+def open_vector_store(path: Path, embeddings: Embeddings) -> FAISS:
+    """
+    Abre un vector store en formato mapeable o, si todavía está en el formato
+    de `FAISS.save_local`, mapea al menos su índice y carga el docstore pickle.
+    """
+    path = Path(path)
+    if is_mapped(path):
+        return load_mapped(path, embeddings)
+    index = read_index_mmap(path / "index.faiss")
+    with open(path / "index.pkl", "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id
+    )
+
+
+if __name__ == "__main__":
+    # Convierte un vector store guardado con FAISS.save_local al formato mapeable:
+    #   python -m ct.vectorstore.mapped <directorio>
+    import sys
+    origen = Path(sys.argv[1])
+    vector_store = FAISS.load_local(str(origen), embeddings=None, allow_dangerous_deserialization=True)
+    save_mapped(vector_store, origen)
+    print(f"Vector store convertido al formato mapeable en {origen}")
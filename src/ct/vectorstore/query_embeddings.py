@@ -0,0 +1,51 @@
+import re
+import unicodedata
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from ct.settings.tiered_cache import TieredCache
+from ct.ETL.embedding_cache import EmbeddingCache
+
+# Caché de embeddings de las consultas de búsqueda. Vive fuera de `ct.ETL`
+# porque lo usan los workers del API, que no deben cargar el ETL; de ahí solo
+# se toma la llave de `EmbeddingCache` (sin dependencias del pipeline).
+
+
+def normalize_query(text: str) -> str:
+    """Normaliza una consulta para usarla como llave: NFC, minúsculas y espacios simples."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip().lower()
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Envoltorio para las consultas de búsqueda: `embed_query` pasa por un
+    `TieredCache` cuya llave es el modelo junto con el texto normalizado, así
+    que una consulta repetida (o la misma consulta en cada retriever del
+    ensemble) se embebe una sola vez. Los documentos no se cachean.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: TieredCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = EmbeddingCache.make_key(self.model, normalize_query(text))
+        vector = self.cache.get_or_set(
+            key,
+            lambda: np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        )
+        return vector.tolist()
+
+
+def query_embedding_cache(maxsize: int, ttl: float) -> TieredCache:
+    """Caché de embeddings de consultas; en Redis se guardan como float32 crudos."""
+    return TieredCache(
+        "query_embeddings",
+        maxsize=maxsize,
+        ttl=ttl,
+        dumps=lambda vector: vector.tobytes(),
+        loads=lambda raw: np.frombuffer(raw, dtype=np.float32)
+    )
@@ -0,0 +1,170 @@
+import numpy as np
+from itertools import chain
+from collections import defaultdict
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+from ct.vectorstore.lexical import LexicalIndex, tokenize, is_identifier
+
+
+def mmr_indices(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float) -> list[int]:
+    """
+    Maximal marginal relevance vectorizado. Selecciona exactamente lo mismo que
+    `maximal_marginal_relevance` de LangChain (similitud coseno, empates hacia
+    el primer candidato), pero con la matriz de similitud entre candidatos
+    calculada una sola vez y la redundancia actualizada de forma incremental.
+    """
+    total = len(candidates)
+    k = min(k, total)
+    if k <= 0:
+        return []
+
+    normas = np.linalg.norm(candidates, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sim_query = np.dot(query[None, :], candidates.T)[0] / (np.linalg.norm(query) * normas)
+        sim_candidatos = np.dot(candidates, candidates.T) / np.outer(normas, normas)
+    sim_query[~np.isfinite(sim_query)] = 0.0
+    sim_candidatos[~np.isfinite(sim_candidatos)] = 0.0
+
+    seleccion = [int(np.argmax(sim_query))]
+    redundancia = sim_candidatos[:, seleccion[0]].copy()
+    disponible = np.ones(total, dtype=bool)
+    disponible[seleccion[0]] = False
+    while len(seleccion) < k:
+        puntaje = lambda_mult * sim_query - (1 - lambda_mult) * redundancia
+        puntaje[~disponible] = -np.inf
+        siguiente = int(np.argmax(puntaje))
+        seleccion.append(siguiente)
+        disponible[siguiente] = False
+        np.maximum(redundancia, sim_candidatos[:, siguiente], out=redundancia)
+    return seleccion
+
+
+def reciprocal_rank_fusion(doc_lists: list[list[Document]], weights: list[float] = None, c: int = 60) -> list[Document]:
+    """
+    Fusión RRF ponderada, igual a `EnsembleRetriever.weighted_reciprocal_rank`:
+    los documentos se deduplican por contenido y se ordenan por puntaje.
+    """
+    weights = weights or [1 / len(doc_lists)] * len(doc_lists)
+    puntaje = defaultdict(float)
+    for docs, weight in zip(doc_lists, weights):
+        for rank, doc in enumerate(docs, start=1):
+            puntaje[doc.page_content] += weight / (rank + c)
+
+    unicos = {}
+    for doc in chain.from_iterable(doc_lists):
+        unicos.setdefault(doc.page_content, doc)
+    return sorted(unicos.values(), reverse=True, key=lambda doc: puntaje[doc.page_content])
+
+
+class PartitionedMMRSearch:
+    """
+    Sustituto del `EnsembleRetriever` con un retriever MMR por colección.
+
+    La consulta se embebe una vez. Con un índice por colección se hace una
+    búsqueda por partición; con el índice combinado (estructura anterior) una
+    sola búsqueda trae los candidatos de ambas colecciones y se separan por
+    metadata. El MMR se calcula con `mmr_indices` y los resultados se fusionan
+    con `reciprocal_rank_fusion`, igual que el ensemble.
+
+    Si hay índices BM25 (`lexical`), sus resultados entran a la misma fusión.
+    Una consulta que es solo una clave o número de modelo que existe en el
+    vocabulario se responde con BM25, sin llamar al API de embeddings; si el
+    identificador viene dentro de una frase, sus aciertos exactos son una
+    lista más de la fusión.
+    """
+
+    def __init__(
+        self,
+        vectorstores: dict[str, FAISS],
+        embeddings: Embeddings,
+        k: dict[str, int],
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        combined: bool = False,
+        lexical: dict[str, LexicalIndex] = None
+    ):
+        self.vectorstores = vectorstores
+        self.embeddings = embeddings
+        self.k = k
+        self.fetch_k = fetch_k
+        self.lambda_mult = lambda_mult
+        self.combined = combined
+        self.lexical = lexical or {}
+
+    @staticmethod
+    def _document(vectorstore: FAISS, i: int) -> Document:
+        doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+        if not isinstance(doc, Document):
+            raise ValueError(f"No se encontró el documento de la posición {i}: {doc}")
+        return doc
+
+    def _candidates(self, vector: np.ndarray) -> dict[str, tuple[FAISS, list[int]]]:
+        """Posiciones candidatas de cada colección, en orden de cercanía."""
+        if not self.combined:
+            candidatos = {}
+            for collection, vectorstore in self.vectorstores.items():
+                _, indices = vectorstore.index.search(vector[None, :], self.fetch_k)
+                candidatos[collection] = (vectorstore, [int(i) for i in indices[0] if i != -1])
+            return candidatos
+
+        # El filtro de LangChain pide el doble de candidatos y descarta los de la otra colección
+        vectorstore = next(iter(self.vectorstores.values()))
+        _, indices = vectorstore.index.search(vector[None, :], self.fetch_k * 2)
+        candidatos = {collection: (vectorstore, []) for collection in self.vectorstores}
+        for i in indices[0]:
+            if i == -1:
+                continue
+            collection = self._document(vectorstore, int(i)).metadata.get("collection")
+            if collection in candidatos:
+                candidatos[collection][1].append(int(i))
+        return candidatos
+
+    def search_by_vector(self, vector) -> dict[str, list[Document]]:
+        vector = np.asarray(vector, dtype=np.float32)
+        resultados = {}
+        for collection, (vectorstore, posiciones) in self._candidates(vector).items():
+            if not posiciones:
+                resultados[collection] = []
+                continue
+            vectores = vectorstore.index.reconstruct_batch(np.asarray(posiciones, dtype=np.int64))
+            seleccion = mmr_indices(vector, vectores, self.k[collection], self.lambda_mult)
+            resultados[collection] = [self._document(vectorstore, posiciones[j]) for j in seleccion]
+        return resultados
+
+    def search_lexical(self, tokens: list[str]) -> dict[str, list[Document]]:
+        resultados = {}
+        for collection, lexical in self.lexical.items():
+            vectorstore = self.vectorstores[collection]
+            posiciones = lexical.search(tokens, self.k[collection])
+            resultados[collection] = [self._document(vectorstore, i) for i in posiciones]
+        return resultados
+
+    def exact_matches(self, tokens: list[str]) -> dict[str, list[Document]] | None:
+        """
+        Resultados de los tokens con forma de clave o modelo que aparecen en
+        algún vocabulario. None si la consulta no tiene ninguno.
+        """
+        identificadores = [
+            token for token in tokens
+            if is_identifier(token) and any(token in lexical for lexical in self.lexical.values())
+        ]
+        if not identificadores:
+            return None
+        return self.search_lexical(identificadores)
+
+    def invoke(self, query: str) -> list[Document]:
+        tokens = tokenize(query) if self.lexical else []
+        exactos = self.exact_matches(tokens) if self.lexical else None
+        # Solo una consulta que es únicamente una clave o modelo se resuelve sin
+        # embeddings; en una frase ("laptop gamer 16gb rtx4060") los aciertos
+        # exactos se suman a la fusión junto con el resto de las palabras
+        if exactos is not None and len(query.split()) == 1:
+            return reciprocal_rank_fusion(list(exactos.values()))
+
+        listas = list(self.search_by_vector(self.embeddings.embed_query(query)).values())
+        if self.lexical:
+            listas += list(self.search_lexical(tokens).values())
+        if exactos is not None:
+            listas += list(exactos.values())
+        return reciprocal_rank_fusion(listas)
@@ -0,0 +1,81 @@
+import os
+import shutil
+from pathlib import Path
+from datetime import datetime, timezone
+
+# Estructura de un vector store versionado:
+#   <base>/versions/<version>/   cada construcción en su propio directorio
+#   <base>/CURRENT               nombre de la versión publicada
+# Dentro de una versión, cada colección es un vector store independiente:
+#   <version>/productos/  <version>/promociones/
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+PARTITIONS = ("productos", "promociones")
+
+
+def new_version_dir(base: Path) -> Path:
+    """Crea un directorio vacío para construir una nueva versión."""
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    path = Path(base) / VERSIONS_DIR / version
+    path.mkdir(parents=True, exist_ok=False)
+    return path
+
+
+def current_version(base: Path) -> Path | None:
+    """
+    Devuelve el directorio de la versión publicada. Si todavía no existe el
+    archivo CURRENT pero hay un vector store en la raíz (estructura anterior),
+    se usa la raíz.
+    """
+    base = Path(base)
+    pointer = base / CURRENT_FILE
+    if pointer.exists():
+        version = pointer.read_text(encoding="utf-8").strip()
+        if version:
+            return base / VERSIONS_DIR / version
+    if (base / "index.faiss").exists() or (base / "vectors.faiss").exists():
+        return base
+    return None
+
+
+def partition_dirs(version_dir: Path) -> dict[str, Path]:
+    """
+    Devuelve el directorio de cada colección presente en la versión. Vacío si
+    la versión es un único vector store combinado (estructura anterior).
+    """
+    version_dir = Path(version_dir)
+    return {name: version_dir / name for name in PARTITIONS if (version_dir / name).is_dir()}
+
+
+def publish_version(base: Path, version_dir: Path, keep: int = 3) -> None:
+    """
+    Publica `version_dir` reemplazando el archivo CURRENT de forma atómica
+    (escritura a un temporal + os.replace), de modo que un lector ve la versión
+    anterior o la nueva, nunca un estado intermedio.
+    """
+    base = Path(base)
+    version_dir = Path(version_dir)
+    tmp = base / f".{CURRENT_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version_dir.name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, base / CURRENT_FILE)
+    prune_versions(base, keep=keep)
+
+
+def prune_versions(base: Path, keep: int = 3) -> None:
+    """
+    Elimina las versiones más antiguas conservando las `keep` más recientes y
+    siempre la publicada. Los workers que aún usan una versión borrada la
+    conservan en memoria hasta recargar.
+    """
+    versions_dir = Path(base) / VERSIONS_DIR
+    if not versions_dir.exists():
+        return
+    actual = current_version(base)
+    versiones = sorted(p for p in versions_dir.iterdir() if p.is_dir())
+    for path in versiones[:-keep] if keep > 0 else versiones:
+        if actual is not None and path.resolve() == actual.resolve():
+            continue
+        shutil.rmtree(path, ignore_errors=True)
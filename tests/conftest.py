@@ -0,0 +1,9 @@
+import os
+
+# Los módulos de ct leen la configuración al importarse: las pruebas no deben
+# depender del .env ni de servicios externos. clients.py crea el cliente de
+# OpenAI al importarse (basta con una llave cualquiera) y sin PODMAN_REDIS_URL
+# los TieredCache trabajan solo con el L1.
+if not os.environ.get("OPENAI_API_KEY"):
+    os.environ["OPENAI_API_KEY"] = "sk-test"
+os.environ["PODMAN_REDIS_URL"] = ""
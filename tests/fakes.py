@@ -0,0 +1,71 @@
+"""Dobles de prueba compartidos: conexiones de MySQL y modelos de embeddings."""
+import hashlib
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class FakeCursor:
+    """
+    Cursor que devuelve `rows` y registra cada consulta. Si `rows` es una
+    función, se llama con los parámetros de cada `execute`.
+    """
+
+    def __init__(self, rows, description=None):
+        self.rows = rows
+        self.description = description
+        self.executed = []
+        self.closed = False
+        self._pendientes = []
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+        self._pendientes = list(self.rows(params) if callable(self.rows) else self.rows)
+
+    def fetchone(self):
+        return self._pendientes.pop(0) if self._pendientes else None
+
+    def fetchall(self):
+        filas, self._pendientes = self._pendientes, []
+        return filas
+
+    def fetchmany(self, size):
+        filas, self._pendientes = self._pendientes[:size], self._pendientes[size:]
+        return filas
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, cursor: FakeCursor):
+        self._cursor = cursor
+        self.closed = False
+
+    def cursor(self, *args, **kwargs):
+        return self._cursor
+
+    def close(self):
+        self.closed = True
+
+
+class HashEmbeddings(Embeddings):
+    """Embeddings deterministas a partir del hash del texto; cuenta las llamadas."""
+
+    model = "hash-test"
+
+    def __init__(self, dim: int = 8):
+        self.dim = dim
+        self.document_calls = []
+        self.query_calls = []
+
+    def _vector(self, text: str) -> list[float]:
+        semilla = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+        return np.random.default_rng(semilla).normal(size=self.dim).astype(np.float32).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.document_calls.append(list(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        self.query_calls.append(text)
+        return self._vector(text)
@@ -0,0 +1,82 @@
+import threading
+import numpy as np
+import pytest
+from ct.ETL.embedding_cache import EmbeddingCache, CachedEmbeddings
+from fakes import HashEmbeddings
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(tmp_path / "embeddings.sqlite", batch_size=2)
+
+
+def test_la_llave_depende_del_modelo_y_del_texto():
+    assert EmbeddingCache.make_key("a", "texto") == EmbeddingCache.make_key("a", "texto")
+    assert EmbeddingCache.make_key("a", "texto") != EmbeddingCache.make_key("b", "texto")
+    assert EmbeddingCache.make_key("a", "texto") != EmbeddingCache.make_key("a", "texto ")
+
+
+def test_get_many_por_lotes(cache):
+    vectores = {f"k{i}": [float(i)] * 3 for i in range(5)}
+    cache.put_many(vectores)
+
+    found = cache.get_many([f"k{i}" for i in range(7)])
+    assert set(found) == set(vectores)
+    assert found["k3"].dtype == np.float32
+    assert found["k3"].tolist() == [3.0, 3.0, 3.0]
+
+
+def test_hits_y_misses(cache):
+    modelo = HashEmbeddings()
+    cobrados = []
+    embeddings = CachedEmbeddings(modelo, cache, before_request=cobrados.append)
+
+    primera = embeddings.embed_documents(["a", "b", "a"])
+    # El texto repetido se embebe una sola vez y solo se cobra lo que se envía
+    assert modelo.document_calls == [["a", "b"]]
+    assert cobrados == [["a", "b"]]
+    assert (embeddings.hits, embeddings.misses) == (1, 2)
+
+    segunda = embeddings.embed_documents(["b", "c", "a"])
+    assert modelo.document_calls[-1] == ["c"]
+    assert cobrados[-1] == ["c"]
+    assert (embeddings.hits, embeddings.misses) == (3, 3)
+    assert segunda[0] == pytest.approx(primera[1])
+    assert segunda[2] == pytest.approx(primera[0])
+
+
+def test_todo_en_cache_no_llama_al_api(cache):
+    modelo = HashEmbeddings()
+    cobrados = []
+    CachedEmbeddings(modelo, cache).embed_documents(["x", "y"])
+
+    embeddings = CachedEmbeddings(modelo, cache, before_request=cobrados.append)
+    embeddings.embed_documents(["y", "x"])
+    assert len(modelo.document_calls) == 1
+    assert cobrados == []
+    assert (embeddings.hits, embeddings.misses) == (2, 0)
+
+
+def test_cambiar_de_modelo_invalida_el_cache(cache):
+    CachedEmbeddings(HashEmbeddings(), cache).embed_documents(["a"])
+
+    otro = HashEmbeddings()
+    otro.model = "otro-modelo"
+    embeddings = CachedEmbeddings(otro, cache)
+    embeddings.embed_documents(["a"])
+    assert otro.document_calls == [["a"]]
+    assert embeddings.misses == 1
+
+
+def test_contadores_desde_varios_hilos(cache):
+    embeddings = CachedEmbeddings(HashEmbeddings(), cache)
+    lotes = [[f"t{i}-{j}" for j in range(10)] for i in range(8)]
+    hilos = [threading.Thread(target=embeddings.embed_documents, args=(lote,)) for lote in lotes * 2]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    # Cada texto cuenta una vez; el total no pierde incrementos entre hilos
+    assert embeddings.hits + embeddings.misses == 160
+    assert embeddings.misses >= 80
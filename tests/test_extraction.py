@@ -0,0 +1,61 @@
+import pytest
+from ct.ETL import extraction
+from ct.ETL.extraction import Extraction
+from fakes import FakeCursor, FakeConnection
+
+COLUMNAS = [("nombre",), ("clave",), ("categoria",)]
+
+
+def _filas(params):
+    # Una fila por id del lote, en el mismo orden
+    return [(f"Producto {i}", f"CLAVE{i}", "Laptops") for i in params]
+
+
+@pytest.fixture
+def cursor(monkeypatch):
+    cursor = FakeCursor(_filas, description=COLUMNAS)
+    monkeypatch.setattr(extraction, "get_connection", lambda: FakeConnection(cursor))
+    return cursor
+
+
+def test_product_query_tiene_un_placeholder_por_id():
+    query = Extraction().product_query(3)
+    assert "IN (%s, %s, %s)" in query
+    assert query.count("%s") == 3
+
+
+def test_get_products_hace_una_consulta_por_lote(cursor):
+    productos = Extraction().get_products(list(range(1, 8)), batch_size=3, fetch_size=2)
+
+    assert [len(params) for _, params in cursor.executed] == [3, 3, 1]
+    assert all(query.count("%s") == len(params) for query, params in cursor.executed)
+    assert list(productos.columns) == ["nombre", "clave", "categoria"]
+    assert productos["clave"].tolist() == [f"CLAVE{i}" for i in range(1, 8)]
+    assert cursor.closed
+
+
+def test_get_products_sin_ids_devuelve_dataframe_vacio(cursor):
+    productos = Extraction().get_products([])
+
+    assert cursor.executed == []
+    assert productos.empty
+    assert list(productos.columns) == ["nombre", "clave", "categoria"]
+
+
+def test_iter_products_entrega_un_dataframe_por_lote(cursor):
+    lotes = list(Extraction().iter_products(list(range(1, 6)), batch_size=2, fetch_size=1))
+
+    assert [len(lote) for lote in lotes] == [2, 2, 1]
+    assert lotes[-1]["clave"].tolist() == ["CLAVE5"]
+
+
+def test_iter_products_propaga_el_error_de_mysql(monkeypatch):
+    def falla(params):
+        raise extraction.mysql.connector.Error("se perdió la conexión")
+
+    cursor = FakeCursor(falla, description=COLUMNAS)
+    monkeypatch.setattr(extraction, "get_connection", lambda: FakeConnection(cursor))
+
+    with pytest.raises(extraction.mysql.connector.Error):
+        list(Extraction().iter_products([1, 2, 3], batch_size=2))
+    assert cursor.closed
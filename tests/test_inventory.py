@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+from ct.tools import inventory
+from ct.tools.inventory import batch_query, inventory_tool, inventory_batch_tool, ainventory_batch_tool
+from ct.settings.tool_cache import inventory_cache, inventory_key
+from fakes import FakeCursor, FakeConnection
+
+
+def _fila(clave, existencias=10):
+    # clave, existencias, precio, moneda, modelo, activo, en_promocion
+    return (clave, existencias, 100.0, 1, "M1", 1, "No")
+
+
+@pytest.fixture
+def cursor(monkeypatch):
+    inventory_cache.invalidate()
+    cursor = FakeCursor(lambda params: [_fila(clave) for clave in params[1:] if clave != "NOEXISTE1"])
+    conexiones = []
+
+    def get_connection():
+        conexiones.append(FakeConnection(cursor))
+        return conexiones[-1]
+
+    monkeypatch.setattr(inventory, "get_connection", get_connection)
+    cursor.conexiones = conexiones
+    yield cursor
+    inventory_cache.invalidate()
+
+
+def test_batch_query_un_placeholder_por_clave():
+    query = batch_query(3)
+    assert "WHERE pro.clave IN (%s, %s, %s)" in query
+    assert query.count("%s") == 4  # listaPrecio + 3 claves
+
+
+def test_batch_en_una_sola_consulta_y_en_orden(cursor):
+    respuesta = inventory_batch_tool(["b2", "A1", "b2 ", "NOEXISTE1"], listaPrecio=5)
+
+    assert len(cursor.executed) == 1
+    assert cursor.executed[0][1] == (5, "B2", "A1", "NOEXISTE1")
+    assert respuesta.splitlines() == [
+        "B2: precio original: $100.0 MXN, 10 unidades disponibles, ¿en promoción?: No",
+        "A1: precio original: $100.0 MXN, 10 unidades disponibles, ¿en promoción?: No",
+        "NOEXISTE1: No se encontró el producto o no tiene existencias.",
+    ]
+    assert all(conexion.closed for conexion in cursor.conexiones)
+
+
+def test_batch_solo_consulta_las_que_no_estan_en_cache(cursor):
+    inventory_batch_tool(["A1"], listaPrecio=5)
+    inventory_batch_tool(["A1", "C3"], listaPrecio=5)
+
+    assert [params for _, params in cursor.executed] == [(5, "A1"), (5, "C3")]
+
+    inventory_batch_tool(["C3", "A1"], listaPrecio=5)
+    assert len(cursor.executed) == 2
+
+    # Otra lista de precio es otra llave
+    inventory_batch_tool(["A1"], listaPrecio=7)
+    assert cursor.executed[-1][1] == (7, "A1")
+
+
+def test_no_encontrado_compartido_entre_herramientas(cursor):
+    assert inventory_tool("NOEXISTE1", 5) == "No se encontró el producto o no tiene existencias."
+    assert inventory_cache.get(inventory_key("NOEXISTE1", 5)) == inventory.NOT_FOUND
+
+    # El batch reutiliza el valor en caché pero arma su propio mensaje con la clave
+    assert inventory_batch_tool(["NOEXISTE1"], 5) == "NOEXISTE1: No se encontró el producto o no tiene existencias."
+    assert len(cursor.executed) == 1
+    assert inventory_tool("NOEXISTE1", 5) == "No se encontró el producto o no tiene existencias."
+
+
+def test_errores_de_base_no_se_guardan(monkeypatch, cursor):
+    def falla():
+        raise inventory.mysql.connector.Error("sin conexión")
+
+    monkeypatch.setattr(inventory, "get_connection", falla)
+    assert inventory_batch_tool(["A1"], 5).startswith("Error de base de datos")
+    assert inventory_cache.get(inventory_key("A1", 5)) is None
+
+
+def test_batch_sin_claves(cursor):
+    assert inventory_batch_tool([" ", ""], 5) == "No se recibieron claves."
+    assert cursor.executed == []
+
+
+def test_version_asincrona(cursor):
+    respuesta = asyncio.run(ainventory_batch_tool(["A1"], 5))
+    assert respuesta.startswith("A1: precio original")
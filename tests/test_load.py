@@ -0,0 +1,86 @@
+import faiss
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from ct.ETL import load as load_module
+from ct.ETL.load import Load
+from ct.vectorstore.versions import current_version, partition_dirs, VERSIONS_DIR
+from fakes import HashEmbeddings
+
+
+@pytest.fixture
+def load():
+    # Sin Transform ni cliente de OpenAI: build_search_index solo usa los vectores
+    return Load.__new__(Load)
+
+
+def _vectores(total, dim=16):
+    return np.random.default_rng(0).normal(size=(total, dim)).astype(np.float32)
+
+
+@pytest.mark.parametrize("index_type, total", [("ivf", 38), ("ivfpq", 255)])
+def test_pocos_vectores_usan_indice_flat(load, index_type, total):
+    index, params = load.build_search_index(_vectores(total), index_type)
+
+    assert isinstance(index, faiss.IndexFlatL2)
+    assert index.ntotal == total
+    assert params == {"index_type": "flat", "requested_index_type": index_type}
+
+
+def test_ivf_con_vectores_suficientes(load):
+    vectores = _vectores(400)
+    index, params = load.build_search_index(vectores, "ivf")
+
+    assert params["index_type"] == "ivf"
+    assert 1 <= params["nlist"] <= 400 // 39
+    # La búsqueda MMR reconstruye vectores por posición
+    assert np.allclose(index.reconstruct(7), vectores[7])
+    assert load.measure_recall(index, vectores) > 0.5
+
+
+def test_tipo_no_soportado(load):
+    with pytest.raises(ValueError):
+        load.build_search_index(_vectores(10), "lsh")
+
+
+@pytest.fixture
+def publicacion(tmp_path, monkeypatch):
+    rutas = {
+        "PRODUCTS_VECTOR_PATH": tmp_path / "productos",
+        "SALES_VECTOR_PATH": tmp_path / "promociones",
+        "SALES_PRODUCTS_VECTOR_PATH": tmp_path / "publicado",
+    }
+    for nombre, ruta in rutas.items():
+        monkeypatch.setattr(load_module, nombre, ruta)
+    rutas["SALES_PRODUCTS_VECTOR_PATH"].mkdir()
+
+    load = Load.__new__(Load)
+    load.embeddings = HashEmbeddings()
+    return load, rutas
+
+
+def _guardar(path, textos, embeddings):
+    store = FAISS.from_texts(textos, embeddings, metadatas=[{"clave": f"C{i}"} for i in range(len(textos))])
+    store.save_local(str(path))
+
+
+def test_publica_aunque_no_haya_promociones(publicacion):
+    load, rutas = publicacion
+    _guardar(rutas["PRODUCTS_VECTOR_PATH"], ["laptop", "monitor", "teclado"], load.embeddings)
+
+    load.sales_products_vs()
+
+    version = current_version(rutas["SALES_PRODUCTS_VECTOR_PATH"])
+    assert set(partition_dirs(version)) == {"productos"}
+    build_info = (version / "build_info.json").read_text(encoding="utf-8")
+    assert '"skipped": "sin documentos"' in build_info
+
+
+def test_sin_documentos_no_publica_version_vacia(publicacion):
+    load, rutas = publicacion
+    with pytest.raises(ValueError):
+        load.sales_products_vs()
+
+    base = rutas["SALES_PRODUCTS_VECTOR_PATH"]
+    assert current_version(base) is None
+    assert list((base / VERSIONS_DIR).iterdir()) == []
@@ -0,0 +1,87 @@
+import time
+from datetime import date, timedelta
+import pytest
+from ct.tools import promotion_rules
+from ct.tools.promotion_rules import PromotionRules, mark_promotions_changed
+from fakes import FakeCursor, FakeConnection
+
+HOY = date.today()
+
+
+def _promo(clave, lista, sucursal, precio, inicio, fin):
+    # clave, sucursal, lista, y las columnas de `query_sales`
+    return (clave, sucursal, lista, 100.0, precio, None, None, None, None, None, inicio, fin, 1)
+
+
+@pytest.fixture
+def cursor(tmp_path, monkeypatch):
+    cursor = FakeCursor([
+        _promo("a1", 5, 1, 80.0, HOY + timedelta(days=2), HOY + timedelta(days=9)),
+        _promo("a1", 5, 1, 90.0, HOY - timedelta(days=1), HOY),
+        _promo("b2", 5, 1, 70.0, HOY - timedelta(days=9), HOY - timedelta(days=1)),
+    ])
+    monkeypatch.setattr(promotion_rules, "get_connection", lambda: FakeConnection(cursor))
+    monkeypatch.setattr(promotion_rules, "PROMOTIONS_STAMP", tmp_path / "promotions.stamp")
+    return cursor
+
+
+def _esperar_recarga(rules):
+    limite = time.monotonic() + 2
+    while rules._refreshing.is_set() and time.monotonic() < limite:
+        time.sleep(0.01)
+
+
+def test_lookup_solo_devuelve_promociones_vigentes(cursor):
+    rules = PromotionRules()
+    assert rules.reload() == 2
+
+    # La que inicia en dos días se ignora; la que termina hoy sigue vigente
+    assert rules.lookup("A1", "5", 1)[1] == 90.0
+    assert rules.lookup("B2", 5, 1) is None
+    assert rules.lookup("A1", 5, 2) is None
+
+
+def test_primera_consulta_carga_en_segundo_plano(cursor):
+    rules = PromotionRules()
+    assert not rules.ready()
+    _esperar_recarga(rules)
+    assert rules.ready()
+    assert rules.metrics()["combinations"] == 2
+
+
+def test_cambio_de_marca_recarga(cursor):
+    rules = PromotionRules(refresh_seconds=3600, stamp_check_seconds=0)
+    rules.reload()
+    assert rules.ready()
+    _esperar_recarga(rules)
+    assert len(cursor.executed) == 1
+
+    mark_promotions_changed()
+    cursor.rows.append(_promo("c3", 5, 1, 60.0, None, None))
+    assert rules.ready()
+    _esperar_recarga(rules)
+
+    assert len(cursor.executed) == 2
+    assert rules.lookup("C3", 5, 1)[1] == 60.0
+    assert rules.metrics()["stamp"] == promotion_rules.PROMOTIONS_STAMP.read_text(encoding="utf-8")
+
+
+def test_si_mysql_falla_conserva_la_tabla(cursor, monkeypatch):
+    rules = PromotionRules(refresh_seconds=30)
+    rules.reload()
+    rules._loaded_at -= 60  # la tabla ya venció
+    intentos = []
+
+    def falla():
+        intentos.append(1)
+        raise RuntimeError("sin base")
+
+    monkeypatch.setattr(promotion_rules, "get_connection", falla)
+    assert rules.ready()
+    _esperar_recarga(rules)
+    assert rules.lookup("A1", 5, 1)[1] == 90.0
+
+    # No se reintenta en cada consulta mientras la base sigue caída
+    assert rules.ready()
+    _esperar_recarga(rules)
+    assert len(intentos) == 1
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from ct.vectorstore.query_embeddings import normalize_query, CachedQueryEmbeddings, query_embedding_cache
+from fakes import HashEmbeddings
+
+
+def test_normalize_query():
+    assert normalize_query("  Laptop   GAMER\n16GB ") == "laptop gamer 16gb"
+    # NFD y NFC son la misma consulta
+    assert normalize_query("impresión") == normalize_query("impresión")
+
+
+def test_consulta_repetida_se_embebe_una_vez():
+    modelo = HashEmbeddings()
+    cache = query_embedding_cache(maxsize=10, ttl=60)
+    embeddings = CachedQueryEmbeddings(modelo, cache)
+
+    primera = embeddings.embed_query("Laptop Gamer")
+    segunda = embeddings.embed_query("  laptop   gamer ")
+    assert modelo.query_calls == ["Laptop Gamer"]
+    assert segunda == pytest.approx(primera)
+    assert cache.metrics()["l1_hits"] == 1
+
+    embeddings.embed_query("monitor")
+    assert modelo.query_calls == ["Laptop Gamer", "monitor"]
+
+
+def test_serializacion_para_redis():
+    cache = query_embedding_cache(maxsize=10, ttl=60)
+    vector = np.arange(4, dtype=np.float32)
+    assert cache.loads(cache.dumps(vector)).tolist() == vector.tolist()
+
+
+def test_documentos_no_se_cachean():
+    modelo = HashEmbeddings()
+    embeddings = CachedQueryEmbeddings(modelo, query_embedding_cache(maxsize=10, ttl=60))
+    embeddings.embed_documents(["a"])
+    embeddings.embed_documents(["a"])
+    assert modelo.document_calls == [["a"], ["a"]]
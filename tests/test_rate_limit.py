@@ -0,0 +1,155 @@
+import json
+import pytest
+import requests
+from ct.ETL import rate_limit, extraction
+from ct.ETL.rate_limit import TokenBucket, HostBackoff
+from ct.ETL.extraction import Extraction, BlockedError
+
+
+class FakeClock:
+    """Reloj manual: `sleep` avanza el tiempo en lugar de esperar."""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+def test_token_bucket_espera_cuando_se_agota(clock):
+    bucket = TokenBucket(rate=2, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_token_bucket_limita_peticiones_mayores_que_la_capacidad(clock):
+    bucket = TokenBucket(rate=10, capacity=5)
+    bucket.acquire(50)
+    assert clock.sleeps == []
+
+
+def test_token_bucket_pause_detiene_a_todos_los_consumidores(clock):
+    bucket = TokenBucket(rate=100, capacity=10)
+    bucket.pause(5)
+    bucket.acquire()
+    assert sum(clock.sleeps) == pytest.approx(5)
+
+
+def test_host_backoff_un_bloqueo_por_ventana_de_pausa(clock):
+    backoff = HostBackoff(base_delay=5, max_delay=120)
+    # Varios hilos reportan el mismo bloqueo: solo el primero cuenta
+    assert [backoff.blocked("ct") for _ in range(8)] == [5.0] * 8
+
+    clock.now += 2
+    assert backoff.blocked("ct") == pytest.approx(3.0)
+
+
+def test_host_backoff_duplica_tras_la_pausa_y_se_reinicia(clock):
+    backoff = HostBackoff(base_delay=5, max_delay=12)
+    esperas = []
+    for _ in range(4):
+        esperas.append(backoff.blocked("ct"))
+        clock.now += esperas[-1]
+    assert esperas == [5, 10, 12, 12]
+    assert backoff.blocked("otro") == 5
+
+    backoff.success("ct")
+    assert backoff.blocked("ct") == 5
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, content_type="application/json"):
+        self.status_code = status_code
+        self.headers = {"Content-Type": content_type}
+        self._body = body
+        self.text = body if isinstance(body, str) else json.dumps(body)
+
+    def json(self):
+        return self._body
+
+
+class FakeScraper:
+    def __init__(self, response):
+        self.response = response
+
+    def post(self, *args, **kwargs):
+        return self.response
+
+
+@pytest.mark.parametrize("status, error", [
+    (403, BlockedError),
+    (429, BlockedError),
+    (503, requests.exceptions.HTTPError),
+    (404, RuntimeError),
+])
+def test_fetch_specification_clasifica_el_codigo(monkeypatch, status, error):
+    monkeypatch.setattr(extraction, "get_scraper", lambda: FakeScraper(FakeResponse(status, {})))
+    with pytest.raises(error) as excinfo:
+        Extraction()._fetch_specification("CLAVE1")
+    if error is RuntimeError:
+        # Un 404 no debe confundirse con un bloqueo ni con un error reintentable
+        assert not isinstance(excinfo.value, (BlockedError, requests.exceptions.HTTPError))
+
+
+def test_fetch_specification_pagina_html_es_bloqueo(monkeypatch):
+    respuesta = FakeResponse(200, "<html>captcha</html>", content_type="text/html")
+    monkeypatch.setattr(extraction, "get_scraper", lambda: FakeScraper(respuesta))
+    with pytest.raises(BlockedError):
+        Extraction()._fetch_specification("CLAVE1")
+
+
+@pytest.fixture
+def specs_files(tmp_path, monkeypatch):
+    checkpoint = tmp_path / "fichas_checkpoint.jsonl"
+    failures = tmp_path / "fichas_fallidas.json"
+    monkeypatch.setattr(extraction, "SPECS_CHECKPOINT", checkpoint)
+    monkeypatch.setattr(extraction, "SPECS_FAILURES", failures)
+    monkeypatch.setattr(extraction, "HostBackoff", lambda: HostBackoff(base_delay=0.01))
+    return checkpoint, failures
+
+
+def test_get_specifications_reintenta_bloqueos_y_reporta_fallas(monkeypatch, specs_files):
+    checkpoint, failures = specs_files
+    failures.write_text('{"VIEJA": "de otra ejecución"}', encoding="utf-8")
+    intentos = {}
+
+    def fetch(self, clave):
+        intentos[clave] = intentos.get(clave, 0) + 1
+        if clave == "BLOQ1" and intentos[clave] == 1:
+            raise BlockedError("403 Forbidden")
+        if clave == "MAL1":
+            raise RuntimeError("HTTP error 404")
+        return {"clave": clave}
+
+    monkeypatch.setattr(Extraction, "_fetch_specification", fetch)
+    extraccion = Extraction()
+    specs = extraccion.get_specifications_cloudscraper(["OK1", "BLOQ1", "MAL1", "OK1"], requests_per_second=1000)
+
+    assert specs == {"OK1": {"clave": "OK1"}, "BLOQ1": {"clave": "BLOQ1"}}
+    assert intentos == {"OK1": 1, "BLOQ1": 2, "MAL1": 1}
+    assert json.loads(failures.read_text(encoding="utf-8")).keys() == {"MAL1"}
+    assert set(extraccion.spec_errors) == {"MAL1"}
+
+    # La siguiente ejecución reanuda desde el checkpoint sin volver a descargar
+    guardadas = {json.loads(linea)["clave"] for linea in checkpoint.read_text(encoding="utf-8").splitlines()}
+    assert guardadas == {"OK1", "BLOQ1"}
+    intentos.clear()
+    assert extraccion.get_specifications_cloudscraper(["OK1", "BLOQ1"]) == specs
+    assert intentos == {}
+    assert not failures.exists()
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+from langchain.schema import Document
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+from ct.vectorstore.mapped import save_mapped, load_mapped
+from ct.vectorstore.lexical import save_lexical, LexicalIndex, tokenize, is_identifier
+from ct.vectorstore.retrieval import mmr_indices, reciprocal_rank_fusion, PartitionedMMRSearch
+from fakes import HashEmbeddings
+
+PRODUCTOS = [
+    ("Laptop gamer Lenovo Legion con RTX4060 y 16GB", "LAPLEN1"),
+    ("Impresora HP LaserJet LJ-M404n monocromática", "IMPHP404"),
+    ("Monitor Samsung 27 pulgadas", "MONSAM27"),
+    ("Teclado mecánico inalámbrico", "TECMEC1"),
+]
+PROMOCIONES = [
+    ("Promoción de la impresora HP LJ-M404n con 10% de descuento", "IMPHP404"),
+    ("Promoción de monitor Samsung", "MONSAM27"),
+]
+
+
+def _doc(texto):
+    return Document(page_content=texto)
+
+
+def test_tokenize_separa_compuestos_y_quita_acentos():
+    assert tokenize("Impresión LJ-M404n") == ["impresion", "lj-m404n", "ljm404n", "lj", "m404n"]
+
+
+def test_is_identifier():
+    assert is_identifier("ljm404n")
+    assert is_identifier("rtx4060")
+    assert not is_identifier("laptop")
+    assert not is_identifier("2024")
+    assert not is_identifier("a1")
+
+
+def test_rrf_deduplica_y_ordena_por_puntaje():
+    a, b, c = _doc("a"), _doc("b"), _doc("c")
+    fusion = reciprocal_rank_fusion([[a, b], [b, c]])
+    # b aparece en ambas listas; a le gana a c por su mejor posición
+    assert [doc.page_content for doc in fusion] == ["b", "a", "c"]
+
+
+def test_rrf_respeta_los_pesos():
+    a, b = _doc("a"), _doc("b")
+    fusion = reciprocal_rank_fusion([[a], [b]], weights=[0.2, 0.8])
+    assert [doc.page_content for doc in fusion] == ["b", "a"]
+
+
+def test_mmr_indices_igual_que_langchain():
+    rng = np.random.default_rng(7)
+    query = rng.normal(size=16).astype(np.float32)
+    candidatos = rng.normal(size=(30, 16)).astype(np.float32)
+    for lambda_mult in (0.0, 0.5, 0.85, 1.0):
+        esperado = maximal_marginal_relevance(query, candidatos, lambda_mult=lambda_mult, k=8)
+        assert mmr_indices(query, candidatos, 8, lambda_mult) == esperado
+    assert mmr_indices(query, candidatos[:0], 8, 0.5) == []
+
+
+def _particion(path, embeddings, textos, collection):
+    store = FAISS.from_texts(
+        [texto for texto, _ in textos],
+        embeddings,
+        metadatas=[{"clave": clave, "collection": collection} for _, clave in textos],
+    )
+    save_mapped(store, path)
+    save_lexical(path)
+    return load_mapped(path, embeddings), LexicalIndex(path)
+
+
+@pytest.fixture
+def retriever(tmp_path):
+    embeddings = HashEmbeddings()
+    productos, lex_productos = _particion(tmp_path / "productos", embeddings, PRODUCTOS, "productos")
+    promociones, lex_promociones = _particion(tmp_path / "promociones", embeddings, PROMOCIONES, "promociones")
+    embeddings.query_calls.clear()
+    return PartitionedMMRSearch(
+        {"productos": productos, "promociones": promociones},
+        embeddings,
+        k={"productos": 2, "promociones": 2},
+        lexical={"productos": lex_productos, "promociones": lex_promociones},
+    )
+
+
+def test_bm25_prioriza_el_termino_exacto(tmp_path):
+    _, lexical = _particion(tmp_path / "p", HashEmbeddings(), PRODUCTOS, "productos")
+    assert "ljm404n" in lexical
+    assert lexical.search(tokenize("impresora m404n"), k=2)[0] == 1
+    assert lexical.search(["inexistente"], k=2) == []
+    assert lexical.search(["samsung"], k=0) == []
+
+
+def test_clave_sola_se_resuelve_sin_embeddings(retriever):
+    docs = retriever.invoke("LJ-M404n")
+
+    assert retriever.embeddings.query_calls == []
+    assert {doc.metadata["clave"] for doc in docs} == {"IMPHP404"}
+    assert {doc.metadata["collection"] for doc in docs} == {"productos", "promociones"}
+
+
+def test_frase_con_clave_fusiona_vector_y_bm25(retriever):
+    docs = retriever.invoke("precio de la impresora LJ-M404n")
+
+    assert retriever.embeddings.query_calls == ["precio de la impresora LJ-M404n"]
+    assert docs[0].metadata["clave"] == "IMPHP404"
+    assert len({doc.page_content for doc in docs}) == len(docs)
+
+
+def test_frase_sin_identificadores_usa_vector_y_bm25(retriever):
+    docs = retriever.invoke("monitor samsung")
+
+    assert retriever.embeddings.query_calls == ["monitor samsung"]
+    assert docs[0].metadata["clave"] == "MONSAM27"
+
+
+def test_sin_indice_lexico_solo_vector(retriever):
+    retriever.lexical = {}
+    docs = retriever.invoke("LJ-M404n")
+
+    assert retriever.embeddings.query_calls == ["LJ-M404n"]
+    assert len(docs) == 4
@@ -0,0 +1,82 @@
+import sys
+import time
+import shutil
+import importlib
+import pytest
+from langchain_community.vectorstores import FAISS
+from ct.settings import config
+from ct.vectorstore.mapped import save_mapped
+from ct.vectorstore.lexical import save_lexical
+from ct.vectorstore.versions import new_version_dir, publish_version
+from fakes import HashEmbeddings
+
+
+def _publicar(base, textos):
+    version = new_version_dir(base)
+    store = FAISS.from_texts(
+        [texto for texto, _ in textos],
+        HashEmbeddings(),
+        metadatas=[{"clave": clave, "collection": "productos"} for _, clave in textos],
+    )
+    save_mapped(store, version / "productos")
+    save_lexical(version / "productos")
+    publish_version(base, version, keep=5)
+    return version
+
+
+@pytest.fixture
+def search(tmp_path, monkeypatch):
+    """Importa `search_information` con un vector store publicado en un directorio temporal."""
+    base = tmp_path / "sales_products_vector_store"
+    _publicar(base, [("Laptop Lenovo", "LAPLEN1"), ("Monitor Samsung", "MONSAM27")])
+    monkeypatch.setattr(config, "SALES_PRODUCTS_VECTOR_PATH", base)
+    monkeypatch.delitem(sys.modules, "ct.tools.search_information", raising=False)
+    modulo = importlib.import_module("ct.tools.search_information")
+    monkeypatch.setattr(modulo, "VECTOR_STORE_CHECK_SECONDS", 0)
+    modulo.base = base
+    return modulo
+
+
+def _esperar(condicion):
+    limite = time.monotonic() + 5
+    while not condicion() and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert condicion()
+
+
+def test_snapshot_sigue_sirviendo_si_se_borra_su_version(search):
+    version = search.base / "versions" / search.get_snapshot().version
+    shutil.rmtree(version)
+
+    respuesta = search.search_by_key_tool("LAPLEN1")
+    assert respuesta["status"] == "ok"
+    assert "Laptop Lenovo" in respuesta["data"]["productos"]["LAPLEN1"]
+
+
+def test_version_rota_no_se_reintenta_hasta_que_cambie_current(search, monkeypatch):
+    anterior = search.get_snapshot().version
+    rota = new_version_dir(search.base)
+    publish_version(search.base, rota, keep=5)
+
+    intentos = []
+    cargar = search.vector_store
+
+    def vector_store(path=None):
+        intentos.append(path.name)
+        return cargar(path)
+
+    monkeypatch.setattr(search, "vector_store", vector_store)
+    search.get_snapshot()
+    _esperar(lambda: search._failed_version == rota.name)
+    for _ in range(5):
+        assert search.get_snapshot().version == anterior
+    time.sleep(0.05)
+    assert intentos == [rota.name]
+
+    # Una versión nueva sí se carga
+    nueva = _publicar(search.base, [("Teclado mecánico", "TECMEC1")])
+    search.get_snapshot()
+    _esperar(lambda: search.get_snapshot().version == nueva.name)
+    assert intentos == [rota.name, nueva.name]
+    assert search._failed_version is None
+    assert search.find_claves("precio del TECMEC1") == ["TECMEC1"]
@@ -0,0 +1,83 @@
+import sys
+import asyncio
+import locale
+import importlib
+import threading
+import pymongo
+import pytest
+
+TERMINADO = {"estatus": {"Facturado": {}, "Terminado": {}}, "pedido": {"detalle": {"producto": [{"cantidad": 2}, {"cantidad": 1}]}}}
+
+
+class FakePedidos:
+    name = "pedidos"
+
+    def __init__(self):
+        self.find_one = lambda *args, **kwargs: None
+
+    def index_information(self):
+        return {}
+
+
+class FakeMongoClient:
+    pedidos = FakePedidos()
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def get_default_database(self):
+        return self
+
+    def __getitem__(self, name):
+        return self.pedidos
+
+
+@pytest.fixture
+def status(monkeypatch):
+    """Importa `status` sin Mongo real ni el locale es_MX instalado."""
+    monkeypatch.setattr(locale, "setlocale", lambda *args: None)
+    monkeypatch.setattr(pymongo, "MongoClient", FakeMongoClient)
+    FakeMongoClient.pedidos = FakePedidos()
+    monkeypatch.delitem(sys.modules, "ct.tools.status", raising=False)
+    return importlib.import_module("ct.tools.status")
+
+
+def test_astatus_consulta_mongo_y_mysql_a_la_vez(status, monkeypatch):
+    # Cada consulta espera a la otra: si corrieran una tras otra, la barrera expira
+    barrera = threading.Barrier(2, timeout=2)
+
+    def find_one(*args, **kwargs):
+        barrera.wait()
+        return TERMINADO
+
+    def descargas_enviadas(factura):
+        barrera.wait()
+        return 2
+
+    status.pedidos.find_one = find_one
+    monkeypatch.setattr(status, "descargas_enviadas", descargas_enviadas)
+
+    respuesta = asyncio.run(status.astatus_tool("W01-123", "CLI1_abc"))
+    assert respuesta == "ESD totales: 3, total de descargas enviadas: 2"
+
+
+def test_status_solo_cuenta_descargas_de_pedidos_esd(status, monkeypatch):
+    consultas = []
+    monkeypatch.setattr(status, "descargas_enviadas", lambda factura: consultas.append(factura) or 0)
+    status.pedidos.find_one = lambda *args, **kwargs: {"estatus": {"Pendiente": {}}}
+
+    assert status.status_tool("W01-123", "CLI1_abc") == "Pedido en generación"
+    assert consultas == []
+
+
+def test_filtro_por_cliente(status):
+    assert status._filtro("W01-123", "CLI1_abc") == {
+        "pedido.encabezado.folio": "W01-123",
+        "pedido.encabezado.cliente": "CLI1",
+    }
+    # Los usuarios internos ven cualquier pedido
+    assert status._filtro("F123", "01CTIN_abc") == {"estatus.Facturado.folioFactura": "F123"}
+
+
+def test_pedido_no_encontrado(status):
+    assert asyncio.run(status.astatus_tool("W01-999", "CLI1_abc")).startswith("¿El folio es correcto?")
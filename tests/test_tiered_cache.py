@@ -0,0 +1,189 @@
+import fnmatch
+import threading
+import time
+import pytest
+import redis
+from ct.settings.tiered_cache import TieredCache
+from ct.settings.tool_cache import inventory_key, sales_key, invalidate_tool_caches, inventory_cache, sales_cache
+
+
+class FakeRedis:
+    """Lo mínimo de redis.Redis que usa TieredCache, sobre un diccionario."""
+
+    def __init__(self):
+        self.data = {}
+        self.calls = []
+        self.down = False
+
+    def _call(self, name):
+        self.calls.append(name)
+        if self.down:
+            raise redis.ConnectionError("sin conexión")
+
+    def get(self, key):
+        self._call("get")
+        return self.data.get(key)
+
+    def mget(self, keys):
+        self._call("mget")
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self._call("set")
+        self.data[key] = value.encode("utf-8") if isinstance(value, str) else value
+
+    def scan_iter(self, match, count=None):
+        self._call("scan_iter")
+        return [key for key in list(self.data) if fnmatch.fnmatchcase(key, match)]
+
+    def delete(self, *keys):
+        self._call("delete")
+        for key in keys:
+            self.data.pop(key, None)
+
+
+def _cache(redis_client=None, **kwargs):
+    cache = TieredCache("prueba", redis_url=None, **kwargs)
+    cache._redis = redis_client
+    return cache
+
+
+def test_llaves_de_las_herramientas():
+    assert inventory_key("lapl123", 5) == "LAPL123:5"
+    assert sales_key("lapl123", 5, "MTY") == "LAPL123:5:MTY"
+    # El prefijo de invalidación de una clave no alcanza a otra que empieza igual
+    assert not inventory_key("LAPL1234", 5).startswith("LAPL123:")
+
+
+def test_invalidate_tool_caches_por_clave():
+    inventory_cache.set(inventory_key("A1", 1), "a")
+    inventory_cache.set(inventory_key("A12", 1), "a12")
+    sales_cache.set(sales_key("a1", 1, "MTY"), "promo")
+
+    invalidate_tool_caches(["a1"])
+    assert inventory_cache.get(inventory_key("A1", 1)) is None
+    assert sales_cache.get(sales_key("A1", 1, "MTY")) is None
+    assert inventory_cache.get(inventory_key("A12", 1)) == "a12"
+
+    invalidate_tool_caches()
+    assert inventory_cache.get(inventory_key("A12", 1)) is None
+
+
+def test_solo_l1_cuenta_hits_y_misses():
+    cache = _cache()
+    assert cache.get("x") is None
+    cache.set("x", {"valor": 1})
+    assert cache.get("x") == {"valor": 1}
+
+    metrics = cache.metrics()
+    assert (metrics["l1_hits"], metrics["l2_hits"], metrics["misses"]) == (1, 0, 1)
+    assert metrics["hit_rate"] == 0.5
+    assert metrics["l1_size"] == 1
+
+
+def test_l1_expira_con_el_ttl():
+    cache = _cache(ttl=0.05)
+    cache.set("x", "valor")
+    time.sleep(0.1)
+    assert cache.get("x") is None
+
+
+def test_redis_usa_el_namespace_y_llena_el_l1():
+    fake = FakeRedis()
+    escritor = _cache(fake)
+    escritor.set("A1:5", "respuesta")
+    assert fake.data == {"prueba:A1:5": b'"respuesta"'}
+
+    # Otro worker: lo encuentra en Redis y lo copia a su L1
+    lector = _cache(fake)
+    assert lector.get("A1:5") == "respuesta"
+    assert lector.get("A1:5") == "respuesta"
+    assert fake.calls.count("get") == 1
+    metrics = lector.metrics()
+    assert (metrics["l1_hits"], metrics["l2_hits"]) == (1, 1)
+
+
+def test_get_many_pide_a_redis_solo_lo_que_falta():
+    fake = FakeRedis()
+    _cache(fake).set("b", 2)
+    cache = _cache(fake)
+    cache.set("a", 1)
+    fake.calls.clear()
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "b": 2}
+    assert fake.calls == ["mget"]
+    metrics = cache.metrics()
+    assert (metrics["l1_hits"], metrics["l2_hits"], metrics["misses"]) == (1, 1, 1)
+
+
+def test_invalidate_por_prefijo_en_ambos_niveles():
+    fake = FakeRedis()
+    cache = _cache(fake)
+    for key in ("A1:1", "A1:2", "A12:1"):
+        cache.set(key, key)
+
+    cache.invalidate("A1:")
+    assert set(fake.data) == {"prueba:A12:1"}
+    assert cache.get("A1:1") is None
+    assert cache.get("A12:1") == "A12:1"
+
+
+def test_si_redis_falla_sigue_con_el_l1():
+    fake = FakeRedis()
+    cache = _cache(fake, retry_seconds=60)
+    fake.down = True
+
+    cache.set("x", 1)
+    assert cache.get("x") == 1
+    assert cache.get_many(["y"]) == {}
+    assert cache.metrics()["redis_errors"] == 1
+    # Durante `retry_seconds` no se vuelve a intentar Redis
+    assert fake.calls == ["set"]
+
+
+def test_errores_de_redis_desde_varios_hilos():
+    cache = _cache(FakeRedis())
+    hilos = [
+        threading.Thread(target=lambda: [cache._redis_failed(redis.ConnectionError("caído")) for _ in range(200)])
+        for _ in range(8)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert cache.metrics()["redis_errors"] == 1600
+
+
+def test_get_or_set_calcula_una_sola_vez():
+    cache = _cache()
+    llamadas = []
+    listo = threading.Event()
+
+    def factory():
+        llamadas.append(1)
+        listo.wait(1)
+        return "valor"
+
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(cache.get_or_set("k", factory))) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    time.sleep(0.05)
+    listo.set()
+    for hilo in hilos:
+        hilo.join()
+
+    assert resultados == ["valor"] * 8
+    assert len(llamadas) == 1
+    assert cache._inflight == {}
+
+
+def test_get_or_set_no_guarda_errores():
+    cache = _cache()
+
+    def falla():
+        raise RuntimeError("sin base")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_set("k", falla)
+    assert cache.get_or_set("k", lambda: 3) == 3
@@ -0,0 +1,70 @@
+from ct.vectorstore.versions import (
+    new_version_dir,
+    current_version,
+    partition_dirs,
+    publish_version,
+    prune_versions,
+    CURRENT_FILE,
+    VERSIONS_DIR,
+)
+
+
+def _version(base, nombre):
+    path = base / VERSIONS_DIR / nombre
+    (path / "productos").mkdir(parents=True)
+    return path
+
+
+def test_sin_publicar_no_hay_version(tmp_path):
+    assert current_version(tmp_path) is None
+
+
+def test_estructura_anterior_usa_la_raiz(tmp_path):
+    (tmp_path / "index.faiss").touch()
+    assert current_version(tmp_path) == tmp_path
+    assert partition_dirs(tmp_path) == {}
+
+
+def test_publicar_y_regresar_a_la_version_anterior(tmp_path):
+    primera = new_version_dir(tmp_path)
+    segunda = new_version_dir(tmp_path)
+    assert primera != segunda and primera.parent == segunda.parent
+
+    publish_version(tmp_path, primera)
+    assert current_version(tmp_path) == primera
+    publish_version(tmp_path, segunda)
+    assert current_version(tmp_path) == segunda
+
+    # Rollback: basta con volver a publicar la versión anterior
+    publish_version(tmp_path, primera)
+    assert current_version(tmp_path) == primera
+    assert segunda.exists()
+    assert (tmp_path / CURRENT_FILE).read_text(encoding="utf-8") == primera.name
+    # No quedan temporales del reemplazo atómico
+    assert sorted(p.name for p in tmp_path.iterdir()) == [CURRENT_FILE, VERSIONS_DIR]
+
+
+def test_prune_conserva_las_recientes_y_la_publicada(tmp_path):
+    versiones = [_version(tmp_path, f"2025010{i}T000000000000Z") for i in range(1, 6)]
+    publish_version(tmp_path, versiones[0], keep=2)
+
+    restantes = sorted(p.name for p in (tmp_path / VERSIONS_DIR).iterdir())
+    assert restantes == [versiones[0].name, versiones[3].name, versiones[4].name]
+
+    publish_version(tmp_path, versiones[4], keep=2)
+    restantes = sorted(p.name for p in (tmp_path / VERSIONS_DIR).iterdir())
+    assert restantes == [versiones[3].name, versiones[4].name]
+
+
+def test_prune_sin_versiones(tmp_path):
+    prune_versions(tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_partition_dirs_solo_las_presentes(tmp_path):
+    version = _version(tmp_path, "20250101T000000000000Z")
+    (version / "otra").mkdir()
+    assert partition_dirs(version) == {"productos": version / "productos"}
+
+    (version / "promociones").mkdir()
+    assert set(partition_dirs(version)) == {"productos", "promociones"}